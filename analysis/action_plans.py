@@ -1,55 +1,139 @@
 """
 Dynamic theme clustering and action plan generation for high-priority issues
 """
+import asyncio
 import logging
 import os
 import json
-from typing import List, Dict, Any, Tuple
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 import sqlite3
-import openai
+
+from analysis.response_cache import get_exact_response, store_response
+from utils.async_runner import run_coroutine
+from utils.openai_client import get_async_client, create_chat_completion
 
 logger = logging.getLogger(__name__)
 
 # Directory to store workflow reference files
 WORKFLOWS_DIR = "workflows"
 
+# Model used to cluster reviews into themes
+CLUSTERING_MODEL = "gpt-4o-mini"
+
+# Structured Outputs schema for the clustering response
+THEMES_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "themes",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "themes": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "title": {"type": "string"},
+                            "summary": {"type": "string"},
+                            "review_ids": {"type": "array", "items": {"type": "string"}}
+                        },
+                        "required": ["title", "summary", "review_ids"],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": ["themes"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# Review text longer than this is truncated in the clustering prompt
+MAX_CLUSTER_REVIEW_CHARS = 500
+
+# Separator used when aggregating categories with GROUP_CONCAT (ASCII unit separator)
+CATEGORY_SEPARATOR = "\x1f"
+
+# Summary of the high-priority review state: priority rows get a new id
+# whenever a review is (re)prioritized, so this changes with the inputs to
+# action planning
+ACTION_PLANS_STAMP_QUERY = '''
+SELECT COUNT(*) || ':' || IFNULL(MAX(id), 0) FROM priorities WHERE priority_level <= 2
+'''
+
+# Summary of the stored plans: the upsert bumps created_at on every changed
+# plan, and deleted or new themes change the count or the newest id
+ACTION_PLANS_VERSION_QUERY = '''
+SELECT COUNT(*), MAX(id), MAX(created_at), TOTAL(review_count) FROM action_plans
+'''
+
+# The plans last read by get_action_plans: (version, plans). save_action_plans
+# drops it, which also covers two saves within the same second
+_plans_cache = None
+
+def parse_json_response(content: str) -> Any:
+    """
+    Parse a JSON response from OpenAI, salvaging the payload when the
+    model wraps it in code fences or surrounding text
+    
+    Args:
+        content: Raw response content
+    
+    Returns:
+        Parsed JSON value
+    
+    Raises:
+        json.JSONDecodeError: If no valid JSON object can be recovered
+    """
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        # Fall back to the outermost {...} block in the response
+        start = content.find('{')
+        end = content.rfind('}')
+        if start == -1 or end <= start:
+            raise
+        logger.warning("Repairing malformed JSON response from OpenAI")
+        return json.loads(content[start:end + 1])
+
 def get_high_priority_reviews(db_conn) -> List[Dict[str, Any]]:
     """
     Get high priority reviews (priority 1-2, Negative or Neutral sentiment)
     
     Args:
         db_conn: Database connection
-        
+    
     Returns:
         List of high priority review dictionaries
     """
     try:
         cursor = db_conn.cursor()
+        cursor.row_factory = sqlite3.Row
         
-        # Get reviews with priority 1-2 and negative/neutral sentiment
+        # Get reviews with priority 1-2 and negative/neutral sentiment,
+        # with their categories aggregated into a single column
         cursor.execute('''
-        SELECT r.*, s.sentiment, p.priority_level
+        SELECT r.review_id, r.review_text, r.rating, s.sentiment, p.priority_level,
+               GROUP_CONCAT(c.category, CHAR(31)) AS category_list
         FROM reviews r
         JOIN priorities p ON r.review_id = p.review_id
         JOIN sentiment s ON r.review_id = s.review_id
+        LEFT JOIN categories c ON r.review_id = c.review_id
         WHERE p.priority_level <= 2 
         AND (s.sentiment = 'Negative' OR s.sentiment = 'Neutral')
+        GROUP BY r.review_id
         ORDER BY p.priority_level, r.date_added DESC
         LIMIT 50
         ''')
         
-        reviews = [dict(zip([column[0] for column in cursor.description], row)) 
-                  for row in cursor.fetchall()]
-        
-        # Get categories for each review
-        for review in reviews:
-            cursor.execute('''
-            SELECT category FROM categories
-            WHERE review_id = ?
-            ''', (review['review_id'],))
-            
-            categories = [row[0] for row in cursor.fetchall()]
-            review['categories'] = categories
+        reviews = []
+        for row in cursor.fetchall():
+            review = dict(row)
+            category_list = review.pop('category_list')
+            review['categories'] = category_list.split(CATEGORY_SEPARATOR) if category_list else []
+            reviews.append(review)
         
         return reviews
     
@@ -57,6 +141,40 @@ def get_high_priority_reviews(db_conn) -> List[Dict[str, Any]]:
         logger.error(f"Error retrieving high priority reviews: {e}")
         return []
 
+async def request_themes(prompt: str, api_key: str) -> str:
+    """
+    Request the theme clustering for a prompt within the shared rate limits
+    
+    Args:
+        prompt: Clustering prompt
+        api_key: OpenAI API key
+    
+    Returns:
+        Raw JSON content of the response
+    """
+    client = get_async_client(api_key)
+    
+    # Call OpenAI API
+    response = await create_chat_completion(
+        client,
+        model=CLUSTERING_MODEL,
+        messages=[
+            {"role": "system", "content": "You are an expert at analyzing app user feedback and clustering related issues."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.0,
+        max_tokens=2000,
+        response_format=THEMES_RESPONSE_FORMAT,
+        stream=True
+    )
+    
+    # Accumulate the streamed tokens as they arrive
+    themes_chunks = []
+    async for chunk in response:
+        if chunk.choices:
+            themes_chunks.append(chunk.choices[0].delta.content or "")
+    return "".join(themes_chunks)
+
 def cluster_reviews_into_themes(reviews: List[Dict[str, Any]], api_key: str) -> List[Dict[str, Any]]:
     """
     Use OpenAI to cluster reviews into common themes
@@ -64,7 +182,7 @@ def cluster_reviews_into_themes(reviews: List[Dict[str, Any]], api_key: str) ->
     Args:
         reviews: List of review dictionaries
         api_key: OpenAI API key
-        
+    
     Returns:
         List of theme dictionaries, each containing title, summary, and related reviews
     """
@@ -72,28 +190,26 @@ def cluster_reviews_into_themes(reviews: List[Dict[str, Any]], api_key: str) ->
         return []
     
     try:
-        # Configure OpenAI client
-        client = openai.OpenAI(api_key=api_key)
-        
-        # Prepare the review data for clustering
-        review_texts = []
-        for review in reviews:
-            review_info = {
+        # Prepare the review data for clustering as one compact JSON array
+        review_records = [
+            {
                 "id": review['review_id'],
-                "text": review['review_text'],
+                "text": (review['review_text'] or '')[:MAX_CLUSTER_REVIEW_CHARS],
                 "rating": review['rating'],
                 "sentiment": review.get('sentiment', 'Unknown'),
                 "priority": review.get('priority_level', 5),
                 "categories": review.get('categories', [])
             }
-            review_texts.append(json.dumps(review_info))
+            for review in reviews
+        ]
+        review_texts = json.dumps(review_records, ensure_ascii=False, separators=(',', ':'))
         
         # Create prompt for OpenAI
         prompt = f"""
 You are analyzing app reviews to identify common themes and issues.
-Below are high-priority app reviews in JSON format that need to be clustered into themes.
+Below is a JSON array of high-priority app reviews that need to be clustered into themes.
 
-Each JSON includes:
+Each review includes:
 - id: unique identifier for the review
 - text: the review content
 - rating: star rating (1-5)
@@ -110,88 +226,91 @@ For each theme, provide:
 2. A brief summary of the issue (1-2 sentences)
 3. The IDs of reviews that belong to this theme
 
-Return the results as a JSON array with this format:
-[
-  {{
-    "title": "Theme Title",
-    "summary": "Brief description of the issue",
-    "review_ids": ["id1", "id2", ...]
-  }},
-  ...
-]
+Return the results as a JSON object with this format:
+{{
+  "themes": [
+    {{
+      "title": "Theme Title",
+      "summary": "Brief description of the issue",
+      "review_ids": ["id1", "id2", ...]
+    }},
+    ...
+  ]
+}}
 
 Be specific and practical in your themes. Focus on actionable issues.
 """
         
-        # Call OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo-16k",
-            messages=[
-                {"role": "system", "content": "You are an expert at analyzing app user feedback and clustering related issues."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.0,
-            max_tokens=2000
-        )
+        # Only reuse the response for this exact prompt - a near-identical
+        # prompt may cover different reviews, so its review_ids would be stale
+        themes_json = get_exact_response("themes", prompt)
+        cache_miss = themes_json is None
+        
+        if cache_miss:
+            themes_json = run_coroutine(request_themes(prompt, api_key))
         
         # Parse the themes from the response
-        themes_json = response.choices[0].message.content.strip()
+        themes = parse_json_response(themes_json)["themes"]
         
-        # Handle different formats that might be returned
-        # Sometimes the API returns the JSON with code block formatting
-        if themes_json.startswith("```json"):
-            themes_json = themes_json[7:-3].strip()
-        elif themes_json.startswith("```"):
-            themes_json = themes_json[3:-3].strip()
-            
-        themes = json.loads(themes_json)
+        if cache_miss:
+            store_response("themes", prompt, themes_json)
         
         # Enrich the themes with the actual review objects
+        reviews_by_id = {review['review_id']: review for review in reviews}
         for theme in themes:
-            theme_reviews = []
-            for review_id in theme['review_ids']:
-                for review in reviews:
-                    if review['review_id'] == review_id:
-                        theme_reviews.append(review)
-                        break
-            theme['reviews'] = theme_reviews
-            theme['count'] = len(theme_reviews)
-            
-        return themes
+            theme['reviews'] = [reviews_by_id[review_id] for review_id in theme['review_ids']
+                                if review_id in reviews_by_id]
+            theme['count'] = len(theme['reviews'])
         
+        return themes
+    
     except Exception as e:
         logger.error(f"Error clustering reviews into themes: {e}")
         return []
 
+@lru_cache(maxsize=1)
+def _workflow_files() -> frozenset:
+    """
+    List the workflow files available in WORKFLOWS_DIR (read once per process)
+    
+    Returns:
+        Set of workflow filenames
+    """
+    # Create workflows directory if it doesn't exist
+    if not os.path.exists(WORKFLOWS_DIR):
+        os.makedirs(WORKFLOWS_DIR)
+    
+    return frozenset(os.listdir(WORKFLOWS_DIR))
+
+@lru_cache(maxsize=256)
 def get_workflow_content(theme_title: str) -> str:
     """
     Get the content of a workflow file that matches the theme title
     
+    Results are cached per theme title; call get_workflow_content.cache_clear()
+    and _workflow_files.cache_clear() after changing the workflow files.
+    
     Args:
         theme_title: Title of the theme
-        
+    
     Returns:
         Content of the workflow file, or empty string if not found
     """
-    # Create workflows directory if it doesn't exist
-    if not os.path.exists(WORKFLOWS_DIR):
-        os.makedirs(WORKFLOWS_DIR)
-        
     # Generate a filename from the theme title
     filename = theme_title.lower().replace(" ", "_") + ".txt"
-    filepath = os.path.join(WORKFLOWS_DIR, filename)
     
     # Check if the file exists
-    if os.path.exists(filepath):
+    if filename in _workflow_files():
+        filepath = os.path.join(WORKFLOWS_DIR, filename)
         try:
             with open(filepath, "r") as f:
                 return f.read()
         except Exception as e:
             logger.error(f"Error reading workflow file {filepath}: {e}")
-            
+    
     return ""
 
-def generate_action_plan(theme: Dict[str, Any], workflow_content: str, api_key: str) -> Dict[str, Any]:
+async def generate_action_plan(theme: Dict[str, Any], workflow_content: str, api_key: str) -> Dict[str, Any]:
     """
     Generate an action plan for a theme using OpenAI
     
@@ -199,13 +318,13 @@ def generate_action_plan(theme: Dict[str, Any], workflow_content: str, api_key:
         theme: Theme dictionary
         workflow_content: Content of the workflow file (if found)
         api_key: OpenAI API key
-        
+    
     Returns:
         Dictionary with action plan and suggested user response
     """
     try:
-        # Configure OpenAI client
-        client = openai.OpenAI(api_key=api_key)
+        # Get the shared OpenAI client
+        client = get_async_client(api_key)
         
         # Prepare review information
         review_info = []
@@ -221,7 +340,7 @@ def generate_action_plan(theme: Dict[str, Any], workflow_content: str, api_key:
         else:
             workflow_reference = ""
             instruction = "Create a comprehensive action plan for this issue."
-            
+        
         prompt = f"""
 You are creating an action plan for a theme of high-priority app reviews.
 
@@ -243,27 +362,39 @@ Format your response as a JSON object with these keys:
 - user_response: String with the suggested response to users
 """
         
-        # Call OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are an expert product manager who creates actionable plans for app issues."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.2,
-            max_tokens=1000
-        )
+        # Only reuse the response for this exact prompt, since the plan
+        # depends on the specific reviews in the theme
+        plan_json = await asyncio.to_thread(get_exact_response, "action_plan", prompt)
+        cache_miss = plan_json is None
+        
+        if cache_miss:
+            # Call OpenAI API
+            response = await create_chat_completion(
+                client,
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are an expert product manager who creates actionable plans for app issues."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.2,
+                max_tokens=1000,
+                response_format={"type": "json_object"},
+                stream=True
+            )
+            
+            # Accumulate the streamed tokens as they arrive, yielding to
+            # the other plan requests in between
+            plan_chunks = []
+            async for chunk in response:
+                if chunk.choices:
+                    plan_chunks.append(chunk.choices[0].delta.content or "")
+            plan_json = "".join(plan_chunks)
         
         # Parse the action plan from the response
-        plan_json = response.choices[0].message.content.strip()
+        plan = parse_json_response(plan_json)
         
-        # Handle different formats that might be returned
-        if plan_json.startswith("```json"):
-            plan_json = plan_json[7:-3].strip()
-        elif plan_json.startswith("```"):
-            plan_json = plan_json[3:-3].strip()
-            
-        plan = json.loads(plan_json)
+        if cache_miss:
+            await asyncio.to_thread(store_response, "action_plan", prompt, plan_json)
         
         # Return the action plan
         result = {
@@ -276,7 +407,7 @@ Format your response as a JSON object with these keys:
         }
         
         return result
-        
+    
     except Exception as e:
         logger.error(f"Error generating action plan for theme {theme['title']}: {e}")
         
@@ -290,56 +421,113 @@ Format your response as a JSON object with these keys:
             "review_samples": []
         }
 
-def generate_action_plans(db_conn, api_key: str) -> List[Dict[str, Any]]:
+def identify_themes(high_priority_reviews: List[Dict[str, Any]], api_key: str) -> List[Dict[str, Any]]:
+    """
+    Cluster high priority reviews into themes
+    
+    Args:
+        high_priority_reviews: List of high priority review dictionaries
+        api_key: OpenAI API key
+    
+    Returns:
+        List of theme dictionaries
+    """
+    if not high_priority_reviews:
+        logger.info("No high priority reviews found for action planning")
+        return []
+    
+    logger.info(f"Found {len(high_priority_reviews)} high priority reviews for action planning")
+    
+    # Cluster reviews into themes
+    themes = cluster_reviews_into_themes(high_priority_reviews, api_key)
+    
+    if not themes:
+        logger.warning("No themes identified from reviews")
+        return []
+    
+    logger.info(f"Clustered reviews into {len(themes)} themes")
+    return themes
+
+async def generate_theme_action_plans(themes: List[Dict[str, Any]], api_key: str) -> List[Dict[str, Any]]:
+    """
+    Generate action plans for all themes, with the OpenAI requests running concurrently
+    
+    Args:
+        themes: List of theme dictionaries
+        api_key: OpenAI API key
+    
+    Returns:
+        List of action plan dictionaries, in the same order as the themes
+    """
+    for theme in themes:
+        logger.info(f"Generating action plan for theme: {theme['title']}")
+    
+    action_plans = await asyncio.gather(*[
+        generate_action_plan(theme, get_workflow_content(theme['title']), api_key)
+        for theme in themes
+    ])
+    return list(action_plans)
+
+def action_plan_result(plans: List[Dict[str, Any]], reviews: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Build the result returned by generate_action_plans
+    
+    Args:
+        plans: List of action plan dictionaries
+        reviews: High priority reviews the plans were generated from
+    
+    Returns:
+        Dictionary with the plans, the number of source reviews, and the
+        reviews themselves (for callers that list them when no plans were made)
+    """
+    return {
+        "plans": plans,
+        "source_count": len(reviews),
+        "reviews": reviews
+    }
+
+def generate_action_plans(db_conn, api_key: str) -> Dict[str, Any]:
     """
     Generate action plans for high-priority issues
     
     Args:
         db_conn: Database connection
         api_key: OpenAI API key
-        
+    
     Returns:
-        List of action plan dictionaries
+        Dictionary with 'plans' (list of action plan dictionaries),
+        'source_count' (number of high priority reviews), and 'reviews'
     """
     if not api_key:
         logger.error("OpenAI API key not provided for action plan generation")
-        return []
-        
+        return action_plan_result([], [])
+    
+    return generate_review_action_plans(get_high_priority_reviews(db_conn), api_key)
+
+def generate_review_action_plans(high_priority_reviews: List[Dict[str, Any]], api_key: str) -> Dict[str, Any]:
+    """
+    Generate action plans for already loaded high-priority reviews, without
+    using the database
+    
+    Args:
+        high_priority_reviews: Reviews from get_high_priority_reviews
+        api_key: OpenAI API key
+    
+    Returns:
+        Dictionary with 'plans' (list of action plan dictionaries),
+        'source_count' (number of high priority reviews), and 'reviews'
+    """
     try:
-        # Get high priority reviews
-        high_priority_reviews = get_high_priority_reviews(db_conn)
-        
-        if not high_priority_reviews:
-            logger.info("No high priority reviews found for action planning")
-            return []
-            
-        logger.info(f"Found {len(high_priority_reviews)} high priority reviews for action planning")
-        
-        # Cluster reviews into themes
-        themes = cluster_reviews_into_themes(high_priority_reviews, api_key)
-        
+        themes = identify_themes(high_priority_reviews, api_key)
         if not themes:
-            logger.warning("No themes identified from reviews")
-            return []
-            
-        logger.info(f"Clustered reviews into {len(themes)} themes")
-        
-        # Generate action plans for each theme
-        action_plans = []
-        for theme in themes:
-            # Get the matching workflow if available
-            workflow_content = get_workflow_content(theme['title'])
-            
-            # Generate the action plan
-            logger.info(f"Generating action plan for theme: {theme['title']}")
-            action_plan = generate_action_plan(theme, workflow_content, api_key)
-            action_plans.append(action_plan)
-            
-        return action_plans
+            return action_plan_result([], high_priority_reviews)
         
+        plans = run_coroutine(generate_theme_action_plans(themes, api_key))
+        return action_plan_result(plans, high_priority_reviews)
+    
     except Exception as e:
         logger.error(f"Error in action plan generation: {e}")
-        return []
+        return action_plan_result([], high_priority_reviews)
 
 def get_action_plans(db_conn) -> List[Dict[str, Any]]:
     """
@@ -347,28 +535,98 @@ def get_action_plans(db_conn) -> List[Dict[str, Any]]:
     
     Args:
         db_conn: Database connection
-        
+    
     Returns:
         List of action plan dictionaries
     """
+    global _plans_cache
     try:
-        # Check if we have stored action plans
+        # Reuse the plans read last time while the stored plans are unchanged
         cursor = db_conn.cursor()
+        cursor.execute(ACTION_PLANS_VERSION_QUERY)
+        version = cursor.fetchone()
+        cached = _plans_cache
+        if cached is not None and cached[0] == version:
+            return list(cached[1])
+        
+        cursor.row_factory = sqlite3.Row
+        # Listed last-saved plan first, as when every save rewrote the table
         cursor.execute('''
         SELECT * FROM action_plans
-        ORDER BY id DESC
+        ORDER BY position DESC, id DESC
         LIMIT 20
         ''')
         
-        action_plans = [dict(zip([column[0] for column in cursor.description], row)) 
-                       for row in cursor.fetchall()]
-                       
-        return action_plans
-        
+        plans = [action_plan_from_row(row) for row in cursor.fetchall()]
+        _plans_cache = (version, plans)
+        return list(plans)
+    
     except Exception as e:
         logger.error(f"Error retrieving action plans: {e}")
         return []
 
+@lru_cache(maxsize=256)
+def decode_json_list(text: Optional[str]) -> Tuple[str, ...]:
+    """
+    Decode a stored JSON array column. The result is immutable and cached by
+    the stored text, so showing the same plan again does not parse it again
+    """
+    return tuple(json.loads(text or '[]'))
+
+def action_plan_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+    """Build an action plan dictionary from a stored row, decoding the JSON columns"""
+    plan = dict(row)
+    plan['action_steps'] = decode_json_list(plan['action_steps'])
+    plan['review_samples'] = decode_json_list(plan.get('review_samples'))
+    return plan
+
+def get_action_plan(db_conn, title: str) -> Optional[Dict[str, Any]]:
+    """
+    Get the stored action plan for one theme
+    
+    Args:
+        db_conn: Database connection
+        title: Theme title
+    
+    Returns:
+        Action plan dictionary, or None if there is no plan with that title
+    """
+    try:
+        cursor = db_conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        cursor.execute('''
+        SELECT * FROM action_plans WHERE title = ?
+        ''', (title,))
+        row = cursor.fetchone()
+        return action_plan_from_row(row) if row else None
+    
+    except Exception as e:
+        logger.error(f"Error retrieving action plan: {e}")
+        return None
+
+def action_plans_are_current(db_conn) -> bool:
+    """
+    Check whether the stored action plans were generated from the current
+    high-priority reviews
+    
+    Args:
+        db_conn: Database connection
+    
+    Returns:
+        True if no review has been prioritized since the plans were saved
+    """
+    try:
+        cursor = db_conn.cursor()
+        cursor.execute(f'''
+        SELECT value = ({ACTION_PLANS_STAMP_QUERY}) FROM meta WHERE key = 'action_plans_stamp'
+        ''')
+        row = cursor.fetchone()
+        return bool(row and row[0])
+    
+    except Exception as e:
+        logger.error(f"Error checking action plans stamp: {e}")
+        return False
+
 def save_action_plans(db_conn, action_plans: List[Dict[str, Any]]) -> bool:
     """
     Save generated action plans to the database
@@ -376,37 +634,76 @@ def save_action_plans(db_conn, action_plans: List[Dict[str, Any]]) -> bool:
     Args:
         db_conn: Database connection
         action_plans: List of action plan dictionaries
-        
+    
     Returns:
         Boolean indicating success
     """
+    global _plans_cache
     if not action_plans:
         return False
-        
+    
     try:
-        cursor = db_conn.cursor()
-        
-        # Clear existing action plans
-        cursor.execute('DELETE FROM action_plans')
-        
-        # Insert new action plans
-        for plan in action_plans:
-            cursor.execute('''
-            INSERT INTO action_plans (
-                title, summary, action_steps, user_response, review_count
-            ) VALUES (?, ?, ?, ?, ?)
-            ''', (
+        rows = [
+            (
                 plan['title'],
                 plan['summary'],
                 json.dumps(plan['action_steps']),
                 plan['user_response'],
-                plan['review_count']
-            ))
+                plan['review_count'],
+                json.dumps(plan.get('review_samples', [])),
+                position
+            )
+            for position, plan in enumerate(action_plans)
+        ]
+        
+        cursor = db_conn.cursor()
+        
+        # Replace the stored plans in a single write transaction
+        if not db_conn.in_transaction:
+            cursor.execute('BEGIN IMMEDIATE')
+        
+        # Remove plans for themes that are no longer present
+        titles = [row[0] for row in rows]
+        placeholders = ','.join('?' * len(titles))
+        cursor.execute(f'''
+        DELETE FROM action_plans WHERE title NOT IN ({placeholders})
+        ''', titles)
+        
+        # Insert new action plans, updating existing themes only if they changed
+        cursor.executemany('''
+        INSERT INTO action_plans (
+            title, summary, action_steps, user_response, review_count, review_samples, position
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (title) DO UPDATE SET
+            summary = excluded.summary,
+            action_steps = excluded.action_steps,
+            user_response = excluded.user_response,
+            review_count = excluded.review_count,
+            review_samples = excluded.review_samples,
+            created_at = CURRENT_TIMESTAMP
+        WHERE summary IS NOT excluded.summary
+            OR action_steps IS NOT excluded.action_steps
+            OR user_response IS NOT excluded.user_response
+            OR review_count IS NOT excluded.review_count
+            OR review_samples IS NOT excluded.review_samples
+        ''', rows)
+        
+        # Unchanged plans keep their row, but take their place in this list
+        cursor.executemany('''
+        UPDATE action_plans SET position = ? WHERE title = ? AND position IS NOT ?
+        ''', [(row[6], row[0], row[6]) for row in rows])
+        
+        # Record the review state these plans were generated from
+        cursor.execute(f'''
+        INSERT OR REPLACE INTO meta (key, value)
+        VALUES ('action_plans_stamp', ({ACTION_PLANS_STAMP_QUERY}))
+        ''')
         
         db_conn.commit()
+        _plans_cache = None
         logger.info(f"Saved {len(action_plans)} action plans to database")
         return True
-        
+    
     except Exception as e:
         logger.error(f"Error saving action plans: {e}")
         db_conn.rollback()
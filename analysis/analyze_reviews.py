@@ -6,8 +6,10 @@ import logging
 import sqlite3
 from typing import Dict, Any, List, Tuple
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-from database.sqlite_db import get_unprocessed_reviews, DB_PATH
+from database.sqlite_db import get_unprocessed_reviews, get_reviews_by_ids, get_connection
+from analysis.batch_jobs import get_pending_backfill, ingest_backfill, submit_backfill
 from analysis.sentiment_analysis import batch_process_reviews
 from analysis.categorization import batch_process_categories
 from analysis.priority_assignment import process_priorities
@@ -15,13 +17,38 @@ from analysis.action_plans import generate_action_plans, save_action_plans
 
 logger = logging.getLogger(__name__)
 
+def run_stage(stage, reviews: List[Dict[str, Any]], api_key: str) -> Tuple[int, int]:
+    """
+    Run a batch processing stage on its own database connection
+    
+    SQLite connections cannot be shared across threads, so stages run in
+    a worker thread each get a dedicated connection.
+    
+    Args:
+        stage: Batch processing function taking (reviews, api_key, db_conn)
+        reviews: List of review dictionaries
+        api_key: OpenAI API key
+    
+    Returns:
+        The stage's (processed_count, saved_count) tuple
+    """
+    conn = get_connection()
+    try:
+        return stage(reviews, api_key, conn)
+    finally:
+        conn.close()
+
 def analyze_app_reviews(config: Dict[str, Any]) -> Dict[str, Any]:
     """
     Analyze unprocessed app reviews
     
+    At BATCH_THRESHOLD or more unprocessed reviews, sentiment and categories
+    are requested through the OpenAI Batch API instead, and a later run
+    ingests the results once the jobs have finished.
+    
     Args:
         config: Application configuration containing API keys
-        
+    
     Returns:
         Dictionary with analysis results and statistics
     """
@@ -37,42 +64,80 @@ def analyze_app_reviews(config: Dict[str, Any]) -> Dict[str, Any]:
             "reviews_processed": 0
         }
     
-    # Get unprocessed reviews
-    unprocessed_reviews = get_unprocessed_reviews()
-    if not unprocessed_reviews:
-        logger.info("No unprocessed reviews found")
-        return {
-            "success": True,
-            "reviews_processed": 0,
-            "message": "No unprocessed reviews found"
-        }
-    
-    logger.info(f"Found {len(unprocessed_reviews)} unprocessed reviews")
-    
     # Connect to database
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_connection()
         
-        # Process sentiment
-        sentiment_processed, sentiment_saved = batch_process_reviews(
-            unprocessed_reviews, api_key, conn
-        )
-        logger.info(f"Processed sentiment for {sentiment_processed} reviews, saved {sentiment_saved}")
+        # Ingest a backfill submitted to the Batch API by an earlier run. Its
+        # reviews stay unprocessed until then, so nothing else is analyzed
+        # while it runs
+        backfill_reviews = []
+        backfill = get_pending_backfill(conn)
+        if backfill is not None:
+            if not ingest_backfill(backfill, api_key, conn):
+                conn.close()
+                logger.info("Batch API backfill is still running")
+                return {
+                    "success": True,
+                    "reviews_processed": 0,
+                    "batch_pending": True,
+                    "message": "Batch API backfill is still running"
+                }
+            backfill_reviews = get_reviews_by_ids(backfill['review_ids'])
+            logger.info(f"Ingested the Batch API backfill of {len(backfill_reviews)} reviews")
         
-        # Process categories
-        categories_processed, categories_saved = batch_process_categories(
-            unprocessed_reviews, api_key, conn
-        )
+        # Get unprocessed reviews
+        unprocessed_reviews = get_unprocessed_reviews()
+        logger.info(f"Found {len(unprocessed_reviews)} unprocessed reviews")
+        
+        # Large backlogs go to the Batch API at half the price; the realtime
+        # path below is used if the jobs cannot be submitted
+        batch_threshold = config.get('BATCH_THRESHOLD', 0)
+        batch_submitted = 0
+        if batch_threshold and len(unprocessed_reviews) >= batch_threshold:
+            if submit_backfill(unprocessed_reviews, api_key, conn):
+                batch_submitted = len(unprocessed_reviews)
+                unprocessed_reviews = []
+        
+        if not unprocessed_reviews and not backfill_reviews:
+            conn.close()
+            message = (
+                f"Submitted {batch_submitted} reviews to the Batch API" if batch_submitted
+                else "No unprocessed reviews found"
+            )
+            logger.info(message)
+            return {
+                "success": True,
+                "reviews_processed": 0,
+                "batch_submitted": batch_submitted,
+                "message": message
+            }
+        
+        # Process sentiment and categories concurrently - both stages are
+        # independent and bound by OpenAI latency
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            sentiment_future = executor.submit(
+                run_stage, batch_process_reviews, unprocessed_reviews, api_key
+            )
+            categories_future = executor.submit(
+                run_stage, batch_process_categories, unprocessed_reviews, api_key
+            )
+            
+            sentiment_processed, sentiment_saved = sentiment_future.result()
+            categories_processed, categories_saved = categories_future.result()
+        
+        logger.info(f"Processed sentiment for {sentiment_processed} reviews, saved {sentiment_saved}")
         logger.info(f"Processed categories for {categories_processed} reviews, saved {categories_saved} category associations")
         
-        # Assign priorities
+        # Assign priorities, including the reviews of an ingested backfill
+        analyzed_reviews = {review['review_id']: review for review in backfill_reviews + unprocessed_reviews}
         priorities_processed, priority_counts = process_priorities(
-            unprocessed_reviews, conn
+            list(analyzed_reviews.values()), conn
         )
         logger.info(f"Assigned priorities to {priorities_processed} reviews")
         
         # Generate action plans for high-priority issues using our new clustered approach
-        action_plans = generate_action_plans(conn, api_key)
+        action_plans = generate_action_plans(conn, api_key)['plans']
         logger.info(f"Generated {len(action_plans)} action plans")
         
         # Save generated action plans to database
@@ -86,7 +151,8 @@ def analyze_app_reviews(config: Dict[str, Any]) -> Dict[str, Any]:
         
         return {
             "success": True,
-            "reviews_processed": len(unprocessed_reviews),
+            "reviews_processed": len(analyzed_reviews),
+            "batch_submitted": batch_submitted,
             "sentiment_processed": sentiment_processed,
             "categories_processed": categories_processed,
             "categories_saved": categories_saved,
@@ -95,7 +161,7 @@ def analyze_app_reviews(config: Dict[str, Any]) -> Dict[str, Any]:
             "action_plans_generated": len(action_plans),
             "processing_time_seconds": processing_time
         }
-        
+    
     except Exception as e:
         logger.error(f"Error in review analysis pipeline: {e}")
         return {
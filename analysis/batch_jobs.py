@@ -0,0 +1,275 @@
+"""
+OpenAI Batch API jobs for large, latency-tolerant analysis runs
+Backfills are submitted as one batch job and ingested once it completes,
+at half the per-token price and outside the real-time rate limits
+"""
+import json
+import logging
+from typing import Dict, Any, List, Optional
+
+from analysis.categorization import (
+    CATEGORY_MODEL, CATEGORY_SYSTEM_PROMPT, CATEGORY_PROMPT, validate_categories, save_category_results
+)
+from analysis.sentiment_analysis import (
+    SENTIMENT_MODEL, SENTIMENT_SYSTEM_PROMPT, SENTIMENT_PROMPT, sentiment_result, save_sentiment_results
+)
+from utils.openai_client import get_client
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+
+# meta key holding the backfill waiting on the Batch API, as JSON:
+# {"batch_ids": [...], "review_ids": [...]}
+BACKFILL_META_KEY = "batch_backfill"
+
+# Request settings for each task, matching the real-time single-review calls
+BATCH_TASKS = {
+    "sentiment": {
+        "model": SENTIMENT_MODEL,
+        "system": SENTIMENT_SYSTEM_PROMPT,
+        "prompt": SENTIMENT_PROMPT,
+        "max_tokens": 10
+    },
+    "category": {
+        "model": CATEGORY_MODEL,
+        "system": CATEGORY_SYSTEM_PROMPT,
+        "prompt": CATEGORY_PROMPT,
+        "max_tokens": 50
+    }
+}
+
+def build_batch_request(review: Dict[str, Any], task: str) -> Dict[str, Any]:
+    """
+    Build the Batch API request line for a review
+    
+    Args:
+        review: Review dictionary
+        task: "sentiment" or "category"
+    
+    Returns:
+        Request dictionary with custom_id, method, url, and body
+    """
+    prompt = BATCH_TASKS[task]["prompt"].format(review_text=review['review_text'], rating=review['rating'])
+    
+    return {
+        "custom_id": review['review_id'],
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": {
+            "model": BATCH_TASKS[task]["model"],
+            "messages": [
+                {"role": "system", "content": BATCH_TASKS[task]["system"]},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.0,
+            "max_tokens": BATCH_TASKS[task]["max_tokens"]
+        }
+    }
+
+def submit_batch_job(reviews: List[Dict[str, Any]], api_key: str, task: str = "sentiment") -> Optional[str]:
+    """
+    Submit reviews for analysis through the OpenAI Batch API
+    
+    Args:
+        reviews: List of review dictionaries
+        api_key: OpenAI API key
+        task: "sentiment" or "category"
+    
+    Returns:
+        Batch ID, or None if the job could not be submitted
+    """
+    if task not in BATCH_TASKS:
+        logger.error(f"Unknown batch task: {task}")
+        return None
+    if not api_key or not reviews:
+        return None
+    
+    try:
+        jsonl = "\n".join(json.dumps(build_batch_request(review, task)) for review in reviews)
+        
+        client = get_client(api_key)
+        input_file = client.files.create(
+            file=(f"{task}_batch.jsonl", jsonl.encode()),
+            purpose="batch"
+        )
+        batch = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=BATCH_COMPLETION_WINDOW,
+            metadata={"task": task}
+        )
+        
+        logger.info(f"Submitted {task} batch {batch.id} for {len(reviews)} reviews")
+        return batch.id
+    
+    except Exception as e:
+        logger.error(f"Error submitting {task} batch job: {e}")
+        return None
+
+def poll_and_ingest_batch(batch_id: str, api_key: str, db_conn) -> Optional[int]:
+    """
+    Check a batch job and save its results once it has completed
+    
+    Args:
+        batch_id: Batch ID returned by submit_batch_job
+        api_key: OpenAI API key
+        db_conn: Database connection
+    
+    Returns:
+        Number of results saved, or None if the batch is still running or
+        its status could not be checked
+    """
+    try:
+        client = get_client(api_key)
+        batch = client.batches.retrieve(batch_id)
+    except Exception as e:
+        logger.error(f"Error checking batch {batch_id}: {e}")
+        return None
+    
+    if batch.status in ("validating", "in_progress", "finalizing", "cancelling"):
+        logger.info(f"Batch {batch_id} is {batch.status}")
+        return None
+    
+    try:
+        if batch.status != "completed" or not batch.output_file_id:
+            logger.error(f"Batch {batch_id} ended with status {batch.status}")
+            return 0
+        
+        task = (batch.metadata or {}).get("task", "sentiment")
+        output = client.files.content(batch.output_file_id).text
+        
+        answers = {}
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response = item.get("response") or {}
+            if response.get("status_code") != 200:
+                logger.warning(f"Batch request {item.get('custom_id')} failed: {item.get('error')}")
+                continue
+            answers[item["custom_id"]] = response["body"]["choices"][0]["message"]["content"].strip()
+        
+        if task == "sentiment":
+            results = [sentiment_result(review_id, sentiment) for review_id, sentiment in answers.items()]
+            saved_count = save_sentiment_results(results, db_conn)
+        else:
+            results = {
+                review_id: validate_categories(categories_text.split(','))
+                for review_id, categories_text in answers.items()
+            }
+            saved_count = save_category_results(
+                {review_id: categories for review_id, categories in results.items() if categories},
+                db_conn
+            )
+        
+        logger.info(f"Ingested {len(answers)} {task} results from batch {batch_id}")
+        return saved_count
+    
+    except Exception as e:
+        logger.error(f"Error ingesting batch {batch_id}: {e}")
+        return 0
+
+def cancel_batch_job(batch_id: str, api_key: str):
+    """Cancel a submitted batch job, e.g. when the rest of its backfill failed to submit"""
+    try:
+        get_client(api_key).batches.cancel(batch_id)
+        logger.info(f"Cancelled batch {batch_id}")
+    except Exception as e:
+        logger.error(f"Error cancelling batch {batch_id}: {e}")
+
+def save_pending_backfill(db_conn, backfill: Optional[Dict[str, Any]]):
+    """Record the backfill waiting on the Batch API, or clear it with None"""
+    cursor = db_conn.cursor()
+    if backfill is None:
+        cursor.execute("DELETE FROM meta WHERE key = ?", (BACKFILL_META_KEY,))
+    else:
+        cursor.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            (BACKFILL_META_KEY, json.dumps(backfill))
+        )
+    db_conn.commit()
+
+def get_pending_backfill(db_conn) -> Optional[Dict[str, Any]]:
+    """
+    Get the backfill waiting on the Batch API
+    
+    Args:
+        db_conn: Database connection
+    
+    Returns:
+        Dictionary with 'batch_ids' and 'review_ids', or None if there is none
+    """
+    try:
+        cursor = db_conn.cursor()
+        cursor.execute("SELECT value FROM meta WHERE key = ?", (BACKFILL_META_KEY,))
+        row = cursor.fetchone()
+        return json.loads(row[0]) if row else None
+    except Exception as e:
+        logger.error(f"Error reading pending backfill: {e}")
+        return None
+
+def submit_backfill(reviews: List[Dict[str, Any]], api_key: str, db_conn) -> bool:
+    """
+    Submit sentiment and category jobs for a large set of reviews and record
+    them as the pending backfill
+    
+    If any job cannot be submitted, the others are cancelled so the reviews
+    can be analyzed in real time instead.
+    
+    Args:
+        reviews: List of review dictionaries
+        api_key: OpenAI API key
+        db_conn: Database connection
+    
+    Returns:
+        Boolean indicating whether the backfill was submitted
+    """
+    batch_ids = []
+    for task in BATCH_TASKS:
+        batch_id = submit_batch_job(reviews, api_key, task)
+        if batch_id is None:
+            for submitted_id in batch_ids:
+                cancel_batch_job(submitted_id, api_key)
+            return False
+        batch_ids.append(batch_id)
+    
+    try:
+        save_pending_backfill(db_conn, {
+            "batch_ids": batch_ids,
+            "review_ids": [review['review_id'] for review in reviews]
+        })
+    except Exception as e:
+        logger.error(f"Error recording backfill: {e}")
+        for batch_id in batch_ids:
+            cancel_batch_job(batch_id, api_key)
+        return False
+    
+    logger.info(f"Submitted a Batch API backfill of {len(reviews)} reviews")
+    return True
+
+def ingest_backfill(backfill: Dict[str, Any], api_key: str, db_conn) -> bool:
+    """
+    Ingest the results of every finished job of the pending backfill
+    
+    Args:
+        backfill: Pending backfill returned by get_pending_backfill
+        api_key: OpenAI API key
+        db_conn: Database connection
+    
+    Returns:
+        True once every job has been ingested and the backfill is cleared,
+        False while some are still running
+    """
+    running = [
+        batch_id for batch_id in backfill['batch_ids']
+        if poll_and_ingest_batch(batch_id, api_key, db_conn) is None
+    ]
+    
+    try:
+        save_pending_backfill(db_conn, dict(backfill, batch_ids=running) if running else None)
+    except Exception as e:
+        logger.error(f"Error updating pending backfill: {e}")
+    
+    return not running
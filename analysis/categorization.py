@@ -1,11 +1,19 @@
 """
 Categorization of app reviews using OpenAI
 """
+import asyncio
+import json
 import logging
-import time
+from functools import lru_cache
 from typing import Dict, Any, List, Tuple
-import openai
 import sqlite3
+import numpy as np
+
+from database.sqlite_db import bulk_insert
+from analysis.heuristics import heuristic_categories
+from analysis.review_cache import embed_texts, find_similar_results, store_results
+from utils.async_runner import run_coroutine
+from utils.openai_client import get_async_client, create_chat_completion
 
 logger = logging.getLogger(__name__)
 
@@ -27,111 +35,288 @@ STANDARD_CATEGORIES = [
     "General Feedback"
 ]
 
-CATEGORY_PROMPT = """
-You are categorizing a mobile app review into relevant topics.
+# Lowercased category name -> standard formatting, for validating model answers
+CATEGORY_LOOKUP = {category.lower(): category for category in STANDARD_CATEGORIES}
+
+# Separator used when aggregating categories with GROUP_CONCAT (ASCII unit separator)
+CATEGORY_SEPARATOR = "\x1f"
+
+# Chat model used to categorize reviews, in real time and in Batch API jobs
+CATEGORY_MODEL = "gpt-3.5-turbo"
+
+# Maximum number of categorization requests sent to OpenAI at the same time
+MAX_CONCURRENT_REQUESTS = 10
+
+# Number of reviews categorized per OpenAI request
+CATEGORY_BATCH_SIZE = 10
+
+# Reviews are matched against embeddings of the categories first; up to
+# MAX_CATEGORIES_PER_REVIEW categories at or above this cosine similarity are
+# assigned, and reviews with no category that close go to the chat model
+CATEGORY_SIMILARITY_THRESHOLD = 0.3
+MAX_CATEGORIES_PER_REVIEW = 3
+
+# Category rows above this count are saved through a staging table
+BULK_INSERT_THRESHOLD = 10000
+
+# The category list and instructions never change between requests, so they
+# are built once and sent as the system message; only the review goes in the
+# user message, which keeps the prefix identical for OpenAI prompt caching
+CATEGORIES_STR = ", ".join(STANDARD_CATEGORIES)
+
+CATEGORY_SYSTEM_TEMPLATE = """You are an expert at categorizing mobile app reviews into relevant topics.
 Review each comment carefully and assign relevant categories from the following list:
 {categories}
 
 A review can belong to multiple categories if it mentions multiple issues.
 Pick a maximum of 3 most relevant categories.
 
-Review: "{review_text}"
-Rating: {rating} out of 5 stars
-
 Respond with ONLY the category names, separated by commas.
 Example: "UI/UX, Performance, Bugs/Crashes"
 """
+CATEGORY_SYSTEM_PROMPT = CATEGORY_SYSTEM_TEMPLATE.format(categories=CATEGORIES_STR)
+
+CATEGORY_PROMPT = 'Rating: {rating} out of 5 stars\nReview: "{review_text}"'
+
+BATCH_CATEGORY_SYSTEM_PROMPT = f"""You are an expert at categorizing mobile app reviews into relevant topics.
+Review each comment carefully and assign relevant categories from the following list:
+{CATEGORIES_STR}
+
+A review can belong to multiple categories if it mentions multiple issues.
+Pick a maximum of 3 most relevant categories per review.
+
+Respond with a JSON object containing every review exactly once, in this format:
+{{"results": [{{"review_id": "id1", "categories": ["UI/UX", "Performance"]}}, ...]}}
+"""
+
+BATCH_CATEGORY_PROMPT = "Reviews:\n{reviews}"
+
+def validate_categories(assigned_categories: List[str], categories: List[str] = STANDARD_CATEGORIES) -> List[str]:
+    """
+    Keep only the assigned categories that match a standard category
+    
+    Args:
+        assigned_categories: Category names returned by the model
+        categories: List of categories to choose from
+        
+    Returns:
+        List of valid categories, using the standard formatting
+    """
+    if categories is STANDARD_CATEGORIES:
+        lookup = CATEGORY_LOOKUP
+    else:
+        lookup = {category.lower(): category for category in categories}
+    
+    # Validate against our standard categories (case-insensitive matching)
+    return [
+        lookup[key]  # Use the standard formatting
+        for key in (category.strip().lower() for category in assigned_categories)
+        if key in lookup
+    ]
+
+@lru_cache(maxsize=4)
+def get_category_embeddings(api_key: str) -> np.ndarray:
+    """
+    Embed the standard categories once per API key
+    
+    Args:
+        api_key: OpenAI API key
+        
+    Returns:
+        Array of unit-length embeddings, one row per standard category
+    """
+    return embed_texts([f"App review about {category}" for category in STANDARD_CATEGORIES], api_key)
 
-def categorize_review(review: Dict[str, Any], client, categories: List[str] = STANDARD_CATEGORIES) -> List[str]:
+def categorize_by_embedding(reviews: List[Dict[str, Any]], embeddings: Dict[str, np.ndarray], api_key: str) -> Dict[str, List[str]]:
+    """
+    Categorize reviews by cosine similarity between review and category embeddings
+    
+    Args:
+        reviews: List of review dictionaries
+        embeddings: review_id -> unit-length review embedding
+        api_key: OpenAI API key
+        
+    Returns:
+        Dictionary mapping review_id to list of categories, for the reviews
+        with at least one category above CATEGORY_SIMILARITY_THRESHOLD
+    """
+    reviews = [review for review in reviews if review['review_id'] in embeddings]
+    if not reviews:
+        return {}
+    
+    try:
+        category_embeddings = get_category_embeddings(api_key)
+    except Exception as e:
+        logger.error(f"Error embedding categories: {e}")
+        return {}
+    
+    # One matrix product scores every review against every category
+    review_embeddings = np.stack([embeddings[review['review_id']] for review in reviews])
+    scores = review_embeddings @ category_embeddings.T
+    top = np.argsort(-scores, axis=1)[:, :MAX_CATEGORIES_PER_REVIEW]
+    
+    results = {}
+    for i, review in enumerate(reviews):
+        categories = [
+            STANDARD_CATEGORIES[j] for j in top[i]
+            if scores[i, j] >= CATEGORY_SIMILARITY_THRESHOLD
+        ]
+        if categories:
+            results[review['review_id']] = categories
+    
+    logger.info(f"Categorized {len(results)} of {len(reviews)} reviews by embedding similarity")
+    return results
+
+async def categorize_review(review: Dict[str, Any], client, semaphore: asyncio.Semaphore,
+                            categories: List[str] = STANDARD_CATEGORIES) -> List[str]:
     """
     Categorize a single review using OpenAI
     
     Args:
         review: Review dictionary
-        client: OpenAI client
+        client: AsyncOpenAI client
+        semaphore: Semaphore bounding the number of concurrent requests
         categories: List of categories to choose from
         
     Returns:
         List of assigned categories
     """
     try:
+        logger.info(f"Categorizing review {review['review_id']}")
+        
         # Prepare the prompt
+        if categories is STANDARD_CATEGORIES:
+            system_prompt = CATEGORY_SYSTEM_PROMPT
+        else:
+            system_prompt = CATEGORY_SYSTEM_TEMPLATE.format(categories=", ".join(categories))
         prompt = CATEGORY_PROMPT.format(
-            categories=", ".join(categories),
             review_text=review['review_text'],
             rating=review['rating']
         )
         
         # Call OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are an expert at categorizing app reviews."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.0,  # Use deterministic responses
-            max_tokens=50     # Enough for several categories
-        )
+        async with semaphore:
+            response = await create_chat_completion(
+                client,
+                model=CATEGORY_MODEL,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.0,  # Use deterministic responses
+                max_tokens=50     # Enough for several categories
+            )
         
         # Extract categories from the response
         categories_text = response.choices[0].message.content.strip()
         
-        # Split by comma and clean up whitespace
-        assigned_categories = [cat.strip() for cat in categories_text.split(',')]
-        
-        # Validate against our standard categories (case-insensitive matching)
-        valid_categories = []
-        for assigned_cat in assigned_categories:
-            for standard_cat in categories:
-                if assigned_cat.lower() == standard_cat.lower():
-                    valid_categories.append(standard_cat)  # Use the standard formatting
-                    break
-                    
-        return valid_categories
+        # Split by comma and keep the valid categories
+        return validate_categories(categories_text.split(','), categories)
         
     except Exception as e:
         logger.error(f"Error categorizing review {review.get('review_id', 'unknown')}: {e}")
         return []
 
-def categorize_reviews(reviews: List[Dict[str, Any]], api_key: str) -> Dict[str, List[str]]:
+async def categorize_review_batch(batch: List[Dict[str, Any]], client, semaphore: asyncio.Semaphore) -> Dict[str, List[str]]:
     """
-    Categorize a batch of reviews using OpenAI
+    Categorize several reviews with a single OpenAI request
+    
+    Reviews missing from the response, or the whole batch if the response
+    cannot be parsed, fall back to one request per review.
     
     Args:
-        reviews: List of review dictionaries
-        api_key: OpenAI API key
+        batch: List of review dictionaries
+        client: AsyncOpenAI client
+        semaphore: Semaphore bounding the number of concurrent requests
         
     Returns:
         Dictionary mapping review_id to list of categories
     """
-    if not api_key or not reviews:
-        return {}
-        
-    # Configure OpenAI client
-    client = openai.OpenAI(api_key=api_key)
-    
-    results = {}
-    for review in reviews:
+    answers = {}
+    if len(batch) > 1:
         try:
-            review_id = review['review_id']
+            logger.info(f"Categorizing a batch of {len(batch)} reviews")
             
-            logger.info(f"Categorizing review {review_id}")
+            prompt = BATCH_CATEGORY_PROMPT.format(reviews="\n".join(
+                f"- review_id={review['review_id']} rating={review['rating']} text={json.dumps(review['review_text'])}"
+                for review in batch
+            ))
             
-            # Get categories for this review
-            categories = categorize_review(review, client)
+            async with semaphore:
+                response = await create_chat_completion(
+                    client,
+                    model=CATEGORY_MODEL,
+                    messages=[
+                        {"role": "system", "content": BATCH_CATEGORY_SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.0,
+                    max_tokens=50 * len(batch) + 20,
+                    response_format={"type": "json_object"}
+                )
             
-            if categories:
-                results[review_id] = categories
-                
-            # Be nice to the API with a small delay
-            time.sleep(0.5)
+            results = json.loads(response.choices[0].message.content)['results']
+            answers = {str(item['review_id']): validate_categories(item['categories']) for item in results}
             
         except Exception as e:
-            logger.error(f"Error in categorization for review {review.get('review_id', 'unknown')}: {e}")
+            logger.warning(f"Batched categorization failed, falling back to single reviews: {e}")
+    
+    missing = [review for review in batch if review['review_id'] not in answers]
+    if missing:
+        single_results = await asyncio.gather(*[
+            categorize_review(review, client, semaphore) for review in missing
+        ])
+        for review, categories in zip(missing, single_results):
+            answers[review['review_id']] = categories
+    
+    return answers
+
+async def categorize_reviews_async(reviews: List[Dict[str, Any]], api_key: str) -> Dict[str, List[str]]:
+    """
+    Categorize a batch of reviews using OpenAI, CATEGORY_BATCH_SIZE reviews
+    per request with up to MAX_CONCURRENT_REQUESTS requests in flight at once
+    
+    Args:
+        reviews: List of review dictionaries
+        api_key: OpenAI API key
+        
+    Returns:
+        Dictionary mapping review_id to list of categories
+    """
+    if not api_key or not reviews:
+        return {}
+        
+    # Get the shared OpenAI client
+    client = get_async_client(api_key)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    
+    batch_results = await asyncio.gather(*[
+        categorize_review_batch(reviews[i:i + CATEGORY_BATCH_SIZE], client, semaphore)
+        for i in range(0, len(reviews), CATEGORY_BATCH_SIZE)
+    ])
+    results = {
+        review_id: categories
+        for batch in batch_results
+        for review_id, categories in batch.items()
+        if categories
+    }
     
     logger.info(f"Completed categorization for {len(results)} reviews")
     return results
 
+def categorize_reviews(reviews: List[Dict[str, Any]], api_key: str) -> Dict[str, List[str]]:
+    """
+    Categorize a batch of reviews using OpenAI
+    
+    Args:
+        reviews: List of review dictionaries
+        api_key: OpenAI API key
+        
+    Returns:
+        Dictionary mapping review_id to list of categories
+    """
+    return run_coroutine(categorize_reviews_async(reviews, api_key))
+
 def save_category_results(results: Dict[str, List[str]], db_conn) -> int:
     """
     Save categorization results to database
@@ -150,33 +335,70 @@ def save_category_results(results: Dict[str, List[str]], db_conn) -> int:
         cursor = db_conn.cursor()
         
         # First delete any existing categories for these reviews
-        for review_id in results.keys():
-            cursor.execute('''
-            DELETE FROM categories WHERE review_id = ?
-            ''', (review_id,))
+        cursor.executemany('''
+        DELETE FROM categories WHERE review_id = ?
+        ''', [(review_id,) for review_id in results])
         
         # Then insert new categories
-        count = 0
-        for review_id, categories in results.items():
-            for category in categories:
-                cursor.execute('''
-                INSERT INTO categories (review_id, category)
-                VALUES (?, ?)
-                ''', (review_id, category))
-                count += 1
+        rows = [
+            (review_id, category)
+            for review_id, categories in results.items()
+            for category in categories
+        ]
+        if len(rows) > BULK_INSERT_THRESHOLD:
+            bulk_insert(db_conn, "categories", ("review_id", "category"), rows)
+        else:
+            cursor.executemany('''
+            INSERT INTO categories (review_id, category)
+            VALUES (?, ?)
+            ''', rows)
         
         db_conn.commit()
-        return count
+        return len(rows)
         
     except Exception as e:
         logger.error(f"Error saving category results: {e}")
         db_conn.rollback()
         return 0
 
+def get_known_categories(reviews: List[Dict[str, Any]], db_conn) -> Dict[str, List[str]]:
+    """
+    Get previously stored categories for reviews with identical text
+    
+    Args:
+        reviews: List of review dictionaries
+        db_conn: Database connection
+        
+    Returns:
+        Dictionary mapping review text to list of categories
+    """
+    texts = list({review['review_text'] for review in reviews if review.get('review_text')})
+    if not texts:
+        return {}
+        
+    try:
+        cursor = db_conn.cursor()
+        placeholders = ','.join('?' * len(texts))
+        cursor.execute(f'''
+        SELECT r.review_text, GROUP_CONCAT(c.category, CHAR(31)) FROM reviews r
+        JOIN categories c ON r.review_id = c.review_id
+        WHERE r.review_text IN ({placeholders})
+        GROUP BY r.review_id
+        ''', texts)
+        return {text: category_list.split(CATEGORY_SEPARATOR) for text, category_list in cursor.fetchall()}
+    except Exception as e:
+        logger.error(f"Error looking up known categories: {e}")
+        return {}
+
 def batch_process_categories(reviews: List[Dict[str, Any]], api_key: str, db_conn) -> Tuple[int, int]:
     """
     Process a batch of reviews for categorization and save results
     
+    Reviews whose text was already categorized, that the heuristics can
+    classify, or that closely match a cached review are resolved without
+    a chat completion, as are reviews that closely match a category's
+    embedding; identical texts within the batch are only sent once.
+    
     Args:
         reviews: List of review dictionaries
         api_key: OpenAI API key
@@ -187,11 +409,48 @@ def batch_process_categories(reviews: List[Dict[str, Any]], api_key: str, db_con
     """
     if not reviews:
         return 0, 0
-        
-    # Categorize reviews
-    results = categorize_reviews(reviews, api_key)
+    
+    known_categories = get_known_categories(reviews, db_conn)
+    
+    results = {}
+    needs_llm = []
+    for review in reviews:
+        categories = known_categories.get(review['review_text']) or heuristic_categories(review)
+        if categories:
+            results[review['review_id']] = categories
+        else:
+            needs_llm.append(review)
+    
+    logger.info(
+        f"Resolved categories for {len(results)} of {len(reviews)} reviews without OpenAI"
+    )
+    
+    # Reuse results of near-duplicate reviews categorized before, then
+    # categorize the rest, sending each distinct text once
+    unique_reviews = {}
+    for review in needs_llm:
+        unique_reviews.setdefault(review['review_text'], review)
+    cached, embeddings = find_similar_results("categories", list(unique_reviews.values()), api_key)
+    
+    to_categorize = [review for review in unique_reviews.values() if review['review_id'] not in cached]
+    
+    # Match the rest against the category embeddings, and only send the
+    # reviews without a close enough category to the chat model
+    new_results = categorize_by_embedding(to_categorize, embeddings, api_key)
+    new_results.update(categorize_reviews(
+        [review for review in to_categorize if review['review_id'] not in new_results],
+        api_key
+    ))
+    store_results("categories", to_categorize, embeddings, new_results)
+    
+    # Copy the results to cache hits and reviews with duplicate text
+    for review in needs_llm:
+        unique_review_id = unique_reviews[review['review_text']]['review_id']
+        categories = cached.get(unique_review_id) or new_results.get(unique_review_id)
+        if categories:
+            results[review['review_id']] = categories
     
     # Save results
     saved_count = save_category_results(results, db_conn)
     
-    return len(results), saved_count
\ No newline at end of file
+    return len(results), saved_count
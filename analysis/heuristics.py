@@ -0,0 +1,74 @@
+"""
+Rule-based classification for app reviews that are clear enough to skip OpenAI
+"""
+import re
+from typing import Dict, Any, List, Optional
+
+# Keyword rules are only trusted on short reviews; longer ones usually
+# mention several issues and go to the model
+HEURISTIC_MAX_LENGTH = 200
+
+# Words that make a 5-star review worth a closer look
+NEGATIVE_PATTERN = re.compile(
+    r"\b(crash\w*|bug\w*|freez\w*|error\w*|broken|slow|lag\w*|fail\w*|can'?t|cannot|"
+    r"doesn'?t|won'?t|not work\w*|refund\w*|scam|worst|terrible|hate|useless|problem\w*|issue\w*)\b",
+    re.IGNORECASE
+)
+
+# Crash reports in 1-star reviews
+CRASH_PATTERN = re.compile(r"\b(crash\w*|bug\w*|freez\w*)\b", re.IGNORECASE)
+
+def heuristic_sentiment(review: Dict[str, Any]) -> Optional[str]:
+    """
+    Classify the sentiment of a review without OpenAI when it is unambiguous
+    
+    Args:
+        review: Review dictionary
+    
+    Returns:
+        Positive, Neutral, or Negative, or None if the review needs the model
+    """
+    text = (review.get('review_text') or '').strip()
+    rating = review.get('rating', 3)
+    
+    # Without any text, the rating is all we have
+    if not text:
+        if rating <= 2:
+            return "Negative"
+        return "Neutral" if rating == 3 else "Positive"
+    
+    if len(text) > HEURISTIC_MAX_LENGTH:
+        return None
+    
+    if rating == 5 and not NEGATIVE_PATTERN.search(text):
+        return "Positive"
+    if rating == 1 and CRASH_PATTERN.search(text):
+        return "Negative"
+    
+    return None
+
+def heuristic_categories(review: Dict[str, Any]) -> Optional[List[str]]:
+    """
+    Categorize a review without OpenAI when it is unambiguous
+    
+    Args:
+        review: Review dictionary
+    
+    Returns:
+        List of categories, or None if the review needs the model
+    """
+    text = (review.get('review_text') or '').strip()
+    rating = review.get('rating', 3)
+    
+    if not text:
+        return ["General Feedback"]
+    
+    if len(text) > HEURISTIC_MAX_LENGTH:
+        return None
+    
+    if rating == 5 and not NEGATIVE_PATTERN.search(text):
+        return ["General Feedback"]
+    if rating == 1 and CRASH_PATTERN.search(text):
+        return ["Bugs/Crashes"]
+    
+    return None
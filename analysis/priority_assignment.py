@@ -14,6 +14,9 @@ logger = logging.getLogger(__name__)
 # 4 - Low (minor issues or enhancements)
 # 5 - Minimal (positive feedback or resolved issues)
 
+# Separator used when aggregating categories with GROUP_CONCAT (ASCII unit separator)
+CATEGORY_SEPARATOR = "\x1f"
+
 # High-priority categories
 HIGH_PRIORITY_CATEGORIES = [
     "Bugs/Crashes",
@@ -21,6 +24,13 @@ HIGH_PRIORITY_CATEGORIES = [
     "Payments/Billing",
     "Privacy/Security"
 ]
+HIGH_PRIORITY_CATEGORY_SET = frozenset(HIGH_PRIORITY_CATEGORIES)
+
+# Base priority for each star rating
+RATING_PRIORITY = {1: 1, 2: 2, 3: 3, 4: 4, 5: 5}
+
+# Priority adjustment for each sentiment
+SENTIMENT_ADJUSTMENT = {"Negative": -1, "Positive": 1}
 
 def assign_review_priority(review: Dict[str, Any], sentiment: str, categories: List[str]) -> int:
     """
@@ -36,36 +46,17 @@ def assign_review_priority(review: Dict[str, Any], sentiment: str, categories: L
     """
     rating = review.get('rating', 3)
     
-    # Start with default priority
-    priority = 3  # Medium
+    # Base priority from the rating: 1 star is Critical ... 5 stars is Minimal
+    priority = RATING_PRIORITY.get(rating) or (1 if rating <= 1 else 5)
     
-    # Adjust based on rating
-    if rating <= 1:
-        priority = 1  # Critical for 1-star reviews
-    elif rating == 2:
-        priority = 2  # High for 2-star reviews
-    elif rating == 3:
-        priority = 3  # Medium for 3-star reviews
-    elif rating == 4:
-        priority = 4  # Low for 4-star reviews
-    else:  # rating == 5
-        priority = 5  # Minimal for 5-star reviews
+    # Adjust based on sentiment (Negative raises priority, Positive lowers it)
+    priority = max(1, min(5, priority + SENTIMENT_ADJUSTMENT.get(sentiment, 0)))
     
-    # Further adjust based on sentiment
-    if sentiment == "Negative" and priority > 1:
-        priority -= 1  # Increase priority for negative sentiment
-    elif sentiment == "Positive" and priority < 5:
-        priority += 1  # Decrease priority for positive sentiment
+    # Critical categories increase priority once
+    if not HIGH_PRIORITY_CATEGORY_SET.isdisjoint(categories):
+        priority = max(1, priority - 1)
     
-    # Finally, adjust based on categories
-    # Critical categories can override to increase priority
-    for category in categories:
-        if category in HIGH_PRIORITY_CATEGORIES and priority > 1:
-            priority -= 1
-            break  # Only decrease priority once
-    
-    # Ensure priority is in range 1-5
-    return max(1, min(5, priority))
+    return priority
 
 def process_priorities(reviews: List[Dict[str, Any]], db_conn) -> Tuple[int, Dict[int, int]]:
     """
@@ -87,34 +78,40 @@ def process_priorities(reviews: List[Dict[str, Any]], db_conn) -> Tuple[int, Dic
     try:
         cursor = db_conn.cursor()
         
+        # Get sentiment and categories for all reviews in one query
+        review_ids = [review['review_id'] for review in reviews]
+        placeholders = ','.join('?' * len(review_ids))
+        cursor.execute(f'''
+        SELECT r.review_id, s.sentiment, GROUP_CONCAT(c.category, CHAR(31))
+        FROM reviews r
+        LEFT JOIN sentiment s ON r.review_id = s.review_id
+        LEFT JOIN categories c ON r.review_id = c.review_id
+        WHERE r.review_id IN ({placeholders})
+        GROUP BY r.review_id
+        ''', review_ids)
+        analysis = {
+            review_id: (sentiment or "Neutral", category_list.split(CATEGORY_SEPARATOR) if category_list else [])
+            for review_id, sentiment, category_list in cursor.fetchall()
+        }
+        
+        priority_rows = []
         for review in reviews:
             review_id = review['review_id']
-            
-            # Get sentiment
-            cursor.execute('''
-            SELECT sentiment FROM sentiment WHERE review_id = ?
-            ''', (review_id,))
-            result = cursor.fetchone()
-            sentiment = result[0] if result else "Neutral"
-            
-            # Get categories
-            cursor.execute('''
-            SELECT category FROM categories WHERE review_id = ?
-            ''', (review_id,))
-            categories = [row[0] for row in cursor.fetchall()]
+            sentiment, categories = analysis.get(review_id, ("Neutral", []))
             
             # Assign priority
             priority = assign_review_priority(review, sentiment, categories)
-            
-            # Save priority
-            cursor.execute('''
-            INSERT OR REPLACE INTO priorities (review_id, priority_level)
-            VALUES (?, ?)
-            ''', (review_id, priority))
+            priority_rows.append((review_id, priority))
             
             # Update counts
             priority_counts[priority] = priority_counts.get(priority, 0) + 1
             processed_count += 1
+        
+        # Save all priorities in one statement
+        cursor.executemany('''
+        INSERT OR REPLACE INTO priorities (review_id, priority_level)
+        VALUES (?, ?)
+        ''', priority_rows)
             
         db_conn.commit()
         logger.info(f"Assigned priorities to {processed_count} reviews")
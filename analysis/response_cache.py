@@ -0,0 +1,106 @@
+"""
+Exact-match cache for OpenAI chat responses
+Reuses a stored response when a new prompt is identical to one already answered
+"""
+import hashlib
+import logging
+import sqlite3
+from collections import OrderedDict
+from typing import Optional
+
+from database.sqlite_db import get_thread_connection
+
+logger = logging.getLogger(__name__)
+
+# Stored responses older than this are ignored and pruned; theme and plan
+# prompts embed the current reviews, so old ones rarely recur
+CACHE_TTL_DAYS = 30
+
+# Maximum number of exact-match responses kept in memory
+EXACT_CACHE_SIZE = 256
+
+# In-memory LRU of prompt hash -> response, checked before the database
+_exact_cache = OrderedDict()
+
+def _prompt_hash(kind: str, prompt: str) -> bytes:
+    """Hash a prompt (namespaced by kind) for exact-match lookups"""
+    return hashlib.blake2b(f"{kind}\0{prompt}".encode(), digest_size=16).digest()
+
+def _remember(prompt_hash: bytes, response: str):
+    """Add a response to the in-memory exact-match cache, evicting the oldest entry"""
+    _exact_cache[prompt_hash] = response
+    _exact_cache.move_to_end(prompt_hash)
+    if len(_exact_cache) > EXACT_CACHE_SIZE:
+        _exact_cache.popitem(last=False)
+
+def get_exact_response(kind: str, prompt: str) -> Optional[str]:
+    """
+    Look up a cached response for an identical prompt
+    
+    Args:
+        kind: Namespace for the prompt
+        prompt: Prompt text
+    
+    Returns:
+        Cached response, or None if this exact prompt has not been answered
+    """
+    prompt_hash = _prompt_hash(kind, prompt)
+    
+    if prompt_hash in _exact_cache:
+        _exact_cache.move_to_end(prompt_hash)
+        return _exact_cache[prompt_hash]
+    
+    try:
+        conn = get_thread_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+        SELECT response FROM prompt_cache
+        WHERE hash = ? AND created_at >= datetime('now', ?)
+        ''', (prompt_hash, f'-{CACHE_TTL_DAYS} days'))
+        row = cursor.fetchone()
+    except sqlite3.Error as e:
+        logger.error(f"Error reading prompt cache: {e}")
+        return None
+    
+    if row is None:
+        return None
+    
+    _remember(prompt_hash, row[0])
+    return row[0]
+
+def store_response(kind: str, prompt: str, response: str) -> bool:
+    """
+    Store a response in the cache, pruning responses older than
+    CACHE_TTL_DAYS
+    
+    Args:
+        kind: Namespace for the prompt
+        prompt: Prompt text
+        response: Raw response content to cache
+    
+    Returns:
+        Boolean indicating success
+    """
+    prompt_hash = _prompt_hash(kind, prompt)
+    _remember(prompt_hash, response)
+    
+    conn = get_thread_connection()
+    try:
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+        INSERT OR REPLACE INTO prompt_cache (hash, response)
+        VALUES (?, ?)
+        ''', (prompt_hash, response))
+        
+        cursor.execute('''
+        DELETE FROM prompt_cache WHERE created_at < datetime('now', ?)
+        ''', (f'-{CACHE_TTL_DAYS} days',))
+        
+        conn.commit()
+        return True
+    except sqlite3.Error as e:
+        logger.error(f"Error saving to prompt cache: {e}")
+        conn.rollback()
+        return False
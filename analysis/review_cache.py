@@ -0,0 +1,176 @@
+"""
+Semantic cache of analysis results for near-duplicate reviews
+Reuses the sentiment or categories of a previously analyzed review that says essentially the same thing
+"""
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+from typing import Dict, Any, List, Tuple
+import numpy as np
+
+from database.sqlite_db import get_thread_connection
+from utils.openai_client import get_client
+
+logger = logging.getLogger(__name__)
+
+# Model used to embed review texts
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Maximum number of inputs per embeddings request
+EMBEDDING_BATCH_SIZE = 2048
+
+# Minimum cosine similarity for a cached result to be reused
+SIMILARITY_THRESHOLD = 0.92
+
+# Minimum word overlap (Jaccard) between the two texts, as a cheap second check
+MIN_WORD_OVERLAP = 0.35
+
+# Cached results kept per kind; older ones are pruned as new ones are
+# stored, which bounds the matrix every lookup loads
+MAX_CACHED_RESULTS = 10000
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def text_hash(text: str) -> bytes:
+    """Hash a review text for the cache key"""
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+def word_overlap(text_a: str, text_b: str) -> float:
+    """Jaccard similarity of the lowercased word sets of two texts"""
+    words_a = set(WORD_PATTERN.findall(text_a.lower()))
+    words_b = set(WORD_PATTERN.findall(text_b.lower()))
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+def embed_texts(texts: List[str], api_key: str) -> np.ndarray:
+    """
+    Embed review texts, normalized to unit length
+    
+    Args:
+        texts: Review texts
+        api_key: OpenAI API key
+    
+    Returns:
+        Array of shape (len(texts), dimensions)
+    """
+    client = get_client(api_key)
+    embeddings = []
+    for i in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+        response = client.embeddings.create(model=EMBEDDING_MODEL, input=texts[i:i + EMBEDDING_BATCH_SIZE])
+        embeddings.extend(item.embedding for item in response.data)
+    
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+def find_similar_results(kind: str, reviews: List[Dict[str, Any]], api_key: str) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Find cached results for reviews similar to previously analyzed ones
+    
+    Args:
+        kind: Analysis stage ("sentiment" or "categories")
+        reviews: List of review dictionaries with non-empty text
+        api_key: OpenAI API key
+    
+    Returns:
+        Tuple of (review_id -> cached result for hits, review_id -> embedding
+        for all reviews). The embeddings should be passed to store_results.
+    """
+    if not reviews:
+        return {}, {}
+    
+    try:
+        embeddings = embed_texts([review['review_text'] for review in reviews], api_key)
+    except Exception as e:
+        logger.error(f"Error embedding reviews for the review cache: {e}")
+        return {}, {}
+    
+    embeddings_by_id = {review['review_id']: embedding for review, embedding in zip(reviews, embeddings)}
+    
+    try:
+        conn = get_thread_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+        SELECT review_text, embedding, result FROM review_cache WHERE kind = ?
+        ''', (kind,))
+        rows = cursor.fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"Error reading review cache: {e}")
+        return {}, embeddings_by_id
+    
+    if not rows:
+        return {}, embeddings_by_id
+    
+    # One matrix product scores every review against every cached review
+    cached_embeddings = np.stack([np.frombuffer(row[1], dtype=np.float16) for row in rows]).astype(np.float32)
+    similarities = embeddings @ cached_embeddings.T
+    best_matches = similarities.argmax(axis=1)
+    
+    hits = {}
+    for i, review in enumerate(reviews):
+        best = best_matches[i]
+        if similarities[i, best] < SIMILARITY_THRESHOLD:
+            continue
+        if word_overlap(review['review_text'], rows[best][0]) < MIN_WORD_OVERLAP:
+            continue
+        hits[review['review_id']] = json.loads(rows[best][2])
+    
+    logger.info(f"Review cache hits for {kind}: {len(hits)} of {len(reviews)} reviews")
+    return hits, embeddings_by_id
+
+def store_results(kind: str, reviews: List[Dict[str, Any]], embeddings: Dict[str, np.ndarray], results: Dict[str, Any]) -> int:
+    """
+    Store new analysis results in the review cache, keeping only the
+    newest MAX_CACHED_RESULTS of the kind
+    
+    Args:
+        kind: Analysis stage ("sentiment" or "categories")
+        reviews: List of review dictionaries that were analyzed
+        embeddings: review_id -> embedding, as returned by find_similar_results
+        results: review_id -> result to cache
+    
+    Returns:
+        Number of results stored
+    """
+    rows = [
+        (
+            kind,
+            text_hash(review['review_text']),
+            review['review_text'],
+            embeddings[review['review_id']].astype(np.float16).tobytes(),
+            json.dumps(results[review['review_id']])
+        )
+        for review in reviews
+        if review['review_id'] in results and review['review_id'] in embeddings
+    ]
+    if not rows:
+        return 0
+    
+    conn = get_thread_connection()
+    try:
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+        INSERT OR REPLACE INTO review_cache (kind, text_hash, review_text, embedding, result)
+        VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+        
+        # INSERT OR REPLACE gives refreshed entries a new id, so the lowest
+        # ids are the oldest results
+        cursor.execute('''
+        DELETE FROM review_cache
+        WHERE kind = ? AND id <= (
+            SELECT id FROM review_cache WHERE kind = ?
+            ORDER BY id DESC LIMIT 1 OFFSET ?
+        )
+        ''', (kind, kind, MAX_CACHED_RESULTS))
+        
+        conn.commit()
+        return len(rows)
+    except sqlite3.Error as e:
+        logger.error(f"Error saving to review cache: {e}")
+        conn.rollback()
+        return 0
@@ -1,158 +1,507 @@
 """
-Sentiment analysis for app reviews using OpenAI
+Sentiment analysis for app reviews using a local model or OpenAI
 """
+import asyncio
+import json
 import logging
-import time
-from typing import Dict, Any, List, Tuple
-import openai
-from database.sqlite_db import mark_review_as_processed
+import os
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+from analysis.heuristics import heuristic_sentiment
+from analysis.review_cache import find_similar_results, store_results
+from database.sqlite_db import DB_PATH
+from utils.async_runner import run_coroutine
+from utils.openai_client import get_async_client, create_chat_completion
+
+try:
+    from transformers import pipeline
+except ImportError:  # Optional: sentiment falls back to OpenAI without it
+    pipeline = None
 
 logger = logging.getLogger(__name__)
 
-SENTIMENT_PROMPT = """
-You are analyzing the sentiment of a mobile app review.
+# OpenAI results are appended here as they arrive, so a run that fails
+# part-way can resume without paying for the same reviews again. The file
+# sits next to the database it belongs to and is removed by /reset
+SENTIMENT_CACHE_PATH = os.path.splitext(DB_PATH)[0] + "_sentiment_cache.jsonl"
+
+# Local model used for sentiment instead of OpenAI when transformers is installed
+LOCAL_SENTIMENT_MODEL = "distilbert-base-uncased-finetuned-sst-2-english"
+
+# Number of reviews per local model forward pass
+LOCAL_BATCH_SIZE = 32
+
+# The local model only knows Positive/Negative; below this score the rating
+# decides instead, with 3 stars counting as Neutral
+LOCAL_MIN_CONFIDENCE = 0.9
+
+# Chat model used for sentiment, in real time and in Batch API jobs
+SENTIMENT_MODEL = "gpt-3.5-turbo"
+
+# Maximum number of sentiment requests sent to OpenAI at the same time
+MAX_CONCURRENT_REQUESTS = 10
+
+# Number of reviews classified per OpenAI request
+SENTIMENT_BATCH_SIZE = 10
+
+# Instructions are sent as a fixed system message and only the review goes in
+# the user message, which keeps the prefix identical for OpenAI prompt caching
+SENTIMENT_SYSTEM_PROMPT = """You are a sentiment analysis expert analyzing mobile app reviews.
 Classify the sentiment as one of: "Positive", "Neutral", or "Negative".
 Consider both the rating and the review text in your analysis.
 
-Review text: {review_text}
-Rating: {rating} out of 5 stars
-
 Respond with only a single word: Positive, Neutral, or Negative.
 """
 
-def analyze_sentiment(reviews: List[Dict[str, Any]], api_key: str) -> List[Dict[str, Any]]:
+SENTIMENT_PROMPT = 'Rating: {rating} out of 5 stars\nReview: "{review_text}"'
+
+BATCH_SENTIMENT_SYSTEM_PROMPT = """You are a sentiment analysis expert analyzing mobile app reviews.
+Classify the sentiment of each review as one of: "Positive", "Neutral", or "Negative".
+Consider both the rating and the review text in your analysis.
+
+Respond with a JSON object containing every review exactly once, in this format:
+{"results": [{"review_id": "id1", "sentiment": "Negative"}, ...]}
+"""
+
+BATCH_SENTIMENT_PROMPT = "Reviews:\n{reviews}"
+
+def normalize_sentiment(sentiment: str) -> str:
+    """Normalize a model answer to one of Positive, Neutral, or Negative"""
+    sentiment = sentiment.lower()
+    if "positive" in sentiment:
+        return "Positive"
+    elif "negative" in sentiment:
+        return "Negative"
+    return "Neutral"
+
+def sentiment_result(review_id: str, sentiment: str, confidence: float = 0.9) -> Dict[str, Any]:
     """
-    Analyze sentiment of reviews using OpenAI
+    Build the sentiment result for a review
+    
+    Args:
+        review_id: Review ID
+        sentiment: Sentiment answer from the model
+        confidence: Confidence of the answer; OpenAI answers use a fixed value
+    
+    Returns:
+        Dictionary with review_id, sentiment, and confidence
+    """
+    return {
+        "review_id": review_id,
+        "sentiment": normalize_sentiment(sentiment),
+        "confidence": confidence
+    }
+
+@lru_cache(maxsize=1)
+def get_local_sentiment_model():
+    """
+    Load the local sentiment model once
+    
+    Returns:
+        Hugging Face sentiment pipeline, or None if it is not available
+    """
+    if pipeline is None:
+        return None
+    
+    try:
+        return pipeline("sentiment-analysis", model=LOCAL_SENTIMENT_MODEL, device=-1)
+    except Exception as e:
+        logger.error(f"Error loading local sentiment model, using OpenAI instead: {e}")
+        return None
+
+def local_sentiment(label: str, score: float, rating: int) -> str:
+    """Map a Positive/Negative model label to Positive, Neutral, or Negative"""
+    if score >= LOCAL_MIN_CONFIDENCE:
+        return "Positive" if label.upper() == "POSITIVE" else "Negative"
+    if rating <= 2:
+        return "Negative"
+    return "Neutral" if rating == 3 else "Positive"
+
+def analyze_sentiment_locally(reviews: List[Dict[str, Any]], model) -> List[Dict[str, Any]]:
+    """
+    Analyze sentiment of reviews with the local model
     
     Args:
         reviews: List of review dictionaries
-        api_key: OpenAI API key
-        
+        model: Pipeline returned by get_local_sentiment_model
+    
     Returns:
         List of dictionaries with review_id, sentiment, and confidence
     """
-    if not api_key:
-        logger.error("OpenAI API key not provided for sentiment analysis")
+    if not reviews:
         return []
-        
-    # Configure OpenAI client
-    client = openai.OpenAI(api_key=api_key)
     
-    results = []
-    for review in reviews:
-        try:
-            review_id = review['review_id']
-            review_text = review['review_text']
-            rating = review['rating']
-            
-            logger.info(f"Analyzing sentiment for review {review_id}")
-            
-            # Prepare the prompt
-            prompt = SENTIMENT_PROMPT.format(
-                review_text=review_text,
-                rating=rating
-            )
-            
-            # Call OpenAI API
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
+    try:
+        predictions = model(
+            [review['review_text'] for review in reviews],
+            batch_size=LOCAL_BATCH_SIZE,
+            truncation=True
+        )
+    except Exception as e:
+        logger.error(f"Error analyzing sentiment with the local model: {e}")
+        return []
+    
+    results = [
+        sentiment_result(
+            review['review_id'],
+            local_sentiment(prediction['label'], prediction['score'], review.get('rating', 3)),
+            round(float(prediction['score']), 3)
+        )
+        for review, prediction in zip(reviews, predictions)
+    ]
+    
+    logger.info(f"Completed local sentiment analysis for {len(results)} reviews")
+    return results
+
+async def analyze_review_sentiment(review: Dict[str, Any], client, semaphore: asyncio.Semaphore) -> Optional[Dict[str, Any]]:
+    """
+    Analyze the sentiment of a single review using OpenAI
+    
+    Args:
+        review: Review dictionary
+        client: AsyncOpenAI client
+        semaphore: Semaphore bounding the number of concurrent requests
+    
+    Returns:
+        Dictionary with review_id, sentiment, and confidence, or None on error
+    """
+    try:
+        review_id = review['review_id']
+        review_text = review['review_text']
+        rating = review['rating']
+        
+        logger.info(f"Analyzing sentiment for review {review_id}")
+        
+        # Prepare the prompt
+        prompt = SENTIMENT_PROMPT.format(
+            review_text=review_text,
+            rating=rating
+        )
+        
+        # Call OpenAI API
+        async with semaphore:
+            response = await create_chat_completion(
+                client,
+                model=SENTIMENT_MODEL,
                 messages=[
-                    {"role": "system", "content": "You are a sentiment analysis expert."},
+                    {"role": "system", "content": SENTIMENT_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.0,  # Use deterministic responses
                 max_tokens=10     # We only need a single word
             )
+        
+        # Extract the sentiment from the response
+        sentiment = response.choices[0].message.content.strip()
+        
+        return sentiment_result(review_id, sentiment)
+    
+    except Exception as e:
+        logger.error(f"Error analyzing sentiment for review {review.get('review_id', 'unknown')}: {e}")
+        return None
+
+async def analyze_sentiment_batch(batch: List[Dict[str, Any]], client, semaphore: asyncio.Semaphore) -> List[Dict[str, Any]]:
+    """
+    Analyze the sentiment of several reviews with a single OpenAI request
+    
+    Reviews missing from the response, or the whole batch if the response
+    cannot be parsed, fall back to one request per review.
+    
+    Args:
+        batch: List of review dictionaries
+        client: AsyncOpenAI client
+        semaphore: Semaphore bounding the number of concurrent requests
+    
+    Returns:
+        List of dictionaries with review_id, sentiment, and confidence
+    """
+    answers = {}
+    if len(batch) > 1:
+        try:
+            logger.info(f"Analyzing sentiment for a batch of {len(batch)} reviews")
             
-            # Extract the sentiment from the response
-            sentiment = response.choices[0].message.content.strip()
-            
-            # Normalize to one of our three categories
-            if "positive" in sentiment.lower():
-                normalized_sentiment = "Positive"
-            elif "negative" in sentiment.lower():
-                normalized_sentiment = "Negative"
-            else:
-                normalized_sentiment = "Neutral"
-                
-            # For now, use a fixed confidence value
-            # In a more advanced implementation, this could be derived from 
-            # the model's confidence scores if available
-            confidence = 0.9
-            
-            results.append({
-                "review_id": review_id,
-                "sentiment": normalized_sentiment,
-                "confidence": confidence
-            })
-            
-            # Mark review as processed
-            mark_review_as_processed(review_id)
+            prompt = BATCH_SENTIMENT_PROMPT.format(reviews="\n".join(
+                f"- review_id={review['review_id']} rating={review['rating']} text={json.dumps(review['review_text'])}"
+                for review in batch
+            ))
             
-            # Be nice to the API with a small delay
-            time.sleep(0.5)
+            async with semaphore:
+                response = await create_chat_completion(
+                    client,
+                    model=SENTIMENT_MODEL,
+                    messages=[
+                        {"role": "system", "content": BATCH_SENTIMENT_SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.0,
+                    max_tokens=30 * len(batch) + 20,
+                    response_format={"type": "json_object"}
+                )
             
+            results = json.loads(response.choices[0].message.content)['results']
+            answers = {str(item['review_id']): str(item['sentiment']) for item in results}
+        
         except Exception as e:
-            logger.error(f"Error analyzing sentiment for review {review.get('review_id', 'unknown')}: {e}")
+            logger.warning(f"Batched sentiment analysis failed, falling back to single reviews: {e}")
+    
+    results = []
+    missing = []
+    for review in batch:
+        if review['review_id'] in answers:
+            results.append(sentiment_result(review['review_id'], answers[review['review_id']]))
+        else:
+            missing.append(review)
+    
+    if missing:
+        single_results = await asyncio.gather(*[
+            analyze_review_sentiment(review, client, semaphore) for review in missing
+        ])
+        results.extend(result for result in single_results if result is not None)
+    
+    return results
+
+def load_sentiment_cache() -> Dict[str, Dict[str, Any]]:
+    """
+    Load results saved to the sentiment cache file by an unfinished run
+    
+    Returns:
+        Dictionary mapping review_id to sentiment result
+    """
+    cached = {}
+    try:
+        with open(SENTIMENT_CACHE_PATH, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    cached[record['review_id']] = record
+                except (ValueError, KeyError):
+                    continue  # Partially written line from an interrupted run
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.error(f"Error reading sentiment cache: {e}")
+    return cached
+
+def clear_sentiment_cache():
+    """Remove the sentiment cache file once its results are in the database"""
+    try:
+        os.unlink(SENTIMENT_CACHE_PATH)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.error(f"Error removing sentiment cache: {e}")
+
+async def analyze_sentiment_async(reviews: List[Dict[str, Any]], api_key: str) -> List[Dict[str, Any]]:
+    """
+    Analyze sentiment of reviews using OpenAI, SENTIMENT_BATCH_SIZE reviews
+    per request with up to MAX_CONCURRENT_REQUESTS requests in flight at once
+    
+    Reviews already in the sentiment cache file are not sent again, and new
+    results are appended to it as each request completes.
+    
+    Args:
+        reviews: List of review dictionaries
+        api_key: OpenAI API key
+    
+    Returns:
+        List of dictionaries with review_id, sentiment, and confidence
+    """
+    if not api_key:
+        logger.error("OpenAI API key not provided for sentiment analysis")
+        return []
+    
+    # Resume from results saved by an earlier, unfinished run, splitting the
+    # reviews into cached results and reviews still to analyze in one pass
+    cached = load_sentiment_cache()
+    results = []
+    uncached_reviews = []
+    for review in reviews:
+        result = cached.get(review['review_id'])
+        if result is None:
+            uncached_reviews.append(review)
+        else:
+            results.append(result)
+    reviews = uncached_reviews
+    if results:
+        logger.info(f"Reusing {len(results)} sentiment results from the cache file")
+    
+    # Get the shared OpenAI client
+    client = get_async_client(api_key)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    
+    with open(SENTIMENT_CACHE_PATH, "a", encoding="utf-8") as cache_file:
+        if cache_file.tell():
+            cache_file.write("\n")  # Terminate a line left partial by a crash
+        
+        async def analyze_and_cache(batch):
+            batch_results = await analyze_sentiment_batch(batch, client, semaphore)
+            for result in batch_results:
+                cache_file.write(json.dumps(result) + "\n")
+            cache_file.flush()
+            return batch_results
+        
+        batch_results = await asyncio.gather(*[
+            analyze_and_cache(reviews[i:i + SENTIMENT_BATCH_SIZE])
+            for i in range(0, len(reviews), SENTIMENT_BATCH_SIZE)
+        ])
+    results.extend(result for batch in batch_results for result in batch)
     
     logger.info(f"Completed sentiment analysis for {len(results)} reviews")
     return results
 
+def analyze_sentiment(reviews: List[Dict[str, Any]], api_key: str) -> List[Dict[str, Any]]:
+    """
+    Analyze sentiment of reviews, with the local model if it is available
+    and OpenAI otherwise
+    
+    Args:
+        reviews: List of review dictionaries
+        api_key: OpenAI API key
+    
+    Returns:
+        List of dictionaries with review_id, sentiment, and confidence
+    """
+    model = get_local_sentiment_model()
+    if model is not None:
+        return analyze_sentiment_locally(reviews, model)
+    
+    return run_coroutine(analyze_sentiment_async(reviews, api_key))
+
 def save_sentiment_results(results: List[Dict[str, Any]], db_conn) -> int:
     """
-    Save sentiment analysis results to database
+    Save sentiment analysis results to database and mark the reviews as
+    processed, in a single transaction
     
     Args:
         results: List of sentiment analysis results
         db_conn: Database connection
-        
+    
     Returns:
         Number of results saved
     """
     if not results:
         return 0
-        
+    
     try:
         cursor = db_conn.cursor()
         
-        for result in results:
-            cursor.execute('''
-            INSERT OR REPLACE INTO sentiment (
-                review_id, sentiment, confidence
-            ) VALUES (?, ?, ?)
-            ''', (
-                result['review_id'],
-                result['sentiment'],
-                result['confidence']
-            ))
+        cursor.executemany('''
+        INSERT OR REPLACE INTO sentiment (
+            review_id, sentiment, confidence
+        ) VALUES (?, ?, ?)
+        ''', [
+            (result['review_id'], result['sentiment'], result['confidence'])
+            for result in results
+        ])
+        
+        # One statement marks the whole batch; rows already marked are left
+        # untouched
+        cursor.execute('''
+        UPDATE reviews SET processed = TRUE
+        WHERE review_id IN (SELECT value FROM json_each(?)) AND processed = FALSE
+        ''', (json.dumps([result['review_id'] for result in results]),))
         
         db_conn.commit()
         return len(results)
-        
+    
     except Exception as e:
         logger.error(f"Error saving sentiment results: {e}")
         db_conn.rollback()
         return 0
 
+def get_known_sentiments(reviews: List[Dict[str, Any]], db_conn) -> Dict[str, str]:
+    """
+    Get previously stored sentiments for reviews with identical text
+    
+    Args:
+        reviews: List of review dictionaries
+        db_conn: Database connection
+    
+    Returns:
+        Dictionary mapping review text to sentiment
+    """
+    texts = list({review['review_text'] for review in reviews if review.get('review_text')})
+    if not texts:
+        return {}
+    
+    try:
+        cursor = db_conn.cursor()
+        placeholders = ','.join('?' * len(texts))
+        cursor.execute(f'''
+        SELECT r.review_text, s.sentiment FROM reviews r
+        JOIN sentiment s ON r.review_id = s.review_id
+        WHERE r.review_text IN ({placeholders})
+        ''', texts)
+        return dict(cursor.fetchall())
+    except Exception as e:
+        logger.error(f"Error looking up known sentiments: {e}")
+        return {}
+
 def batch_process_reviews(reviews: List[Dict[str, Any]], api_key: str, db_conn) -> Tuple[int, int]:
     """
     Process a batch of reviews for sentiment analysis and save results
     
+    Reviews whose text was already analyzed, that the heuristics can
+    classify, or that closely match a cached review are resolved without
+    calling OpenAI; identical texts within the batch are only sent once.
+    
     Args:
         reviews: List of review dictionaries
         api_key: OpenAI API key
         db_conn: Database connection
-        
+    
     Returns:
         Tuple of (processed_count, saved_count)
     """
     if not reviews:
         return 0, 0
-        
-    # Analyze sentiment
-    results = analyze_sentiment(reviews, api_key)
     
-    # Save results
+    known_sentiments = get_known_sentiments(reviews, db_conn)
+    
+    results = []
+    needs_llm = []
+    for review in reviews:
+        sentiment = known_sentiments.get(review['review_text']) or heuristic_sentiment(review)
+        if sentiment:
+            results.append(sentiment_result(review['review_id'], sentiment))
+        else:
+            needs_llm.append(review)
+    
+    logger.info(
+        f"Resolved sentiment for {len(results)} of {len(reviews)} reviews without OpenAI"
+    )
+    
+    # Reuse results of near-duplicate reviews analyzed before, then analyze
+    # the rest, sending each distinct text once
+    unique_reviews = {}
+    for review in needs_llm:
+        unique_reviews.setdefault(review['review_text'], review)
+    if get_local_sentiment_model() is None:
+        cached, embeddings = find_similar_results("sentiment", list(unique_reviews.values()), api_key)
+    else:
+        # The local model is cheaper than embedding the reviews for the cache
+        cached, embeddings = {}, {}
+    
+    to_analyze = [review for review in unique_reviews.values() if review['review_id'] not in cached]
+    llm_results = analyze_sentiment(to_analyze, api_key)
+    results.extend(llm_results)
+    
+    new_sentiments = {result['review_id']: result['sentiment'] for result in llm_results}
+    store_results("sentiment", to_analyze, embeddings, new_sentiments)
+    
+    # Copy the results to cache hits and reviews with duplicate text
+    sentiment_by_text = {
+        text: cached.get(review['review_id']) or new_sentiments.get(review['review_id'])
+        for text, review in unique_reviews.items()
+    }
+    for review in needs_llm:
+        sentiment = sentiment_by_text[review['review_text']]
+        if sentiment and review['review_id'] not in new_sentiments:
+            results.append(sentiment_result(review['review_id'], sentiment))
+    
+    # Save results; the cache file is only needed until they are stored
     saved_count = save_sentiment_results(results, db_conn)
+    if saved_count == len(results):
+        clear_sentiment_cache()
     
-    return len(results), saved_count
\ No newline at end of file
+    return len(results), saved_count
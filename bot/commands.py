@@ -1,22 +1,194 @@
 """
 Implementation of Telegram bot commands
 """
+import asyncio
 import logging
 import sqlite3
-import json
-import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from telegram import Update
 from telegram.ext import ContextTypes, filters
 
 from utils.config import load_config
-from utils.export import generate_reviews_csv
-from scraper.google_play_scraper import fetch_reviews
-from database.sqlite_db import get_unprocessed_reviews, get_recent_reviews, get_reviews_by_priority, DB_PATH
-from analysis.analyze_reviews import analyze_app_reviews
-from analysis.action_plans import get_action_plans, generate_action_plans, get_high_priority_reviews, save_action_plans
+from database.sqlite_db import analyze_database, refresh_daily_metrics
+from bot.db_pool import run_db, run_db_read
+
+# The export, scraper and analysis modules (and with them the OpenAI client)
+# take most of a second to import, so the handlers that use them import them
+# on first use instead of delaying the bot's start
 
 logger = logging.getLogger(__name__)
 
+# Runs /process's scraping and analysis, which can take minutes, on its own
+# thread so they neither block the event loop nor tie up the default executor
+# used for database work
+PROCESS_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="process")
+
+# Held while /process runs; SQLite allows one writer, so a second /process is
+# turned away instead of failing with "database is locked" or scraping twice
+PROCESS_LOCK = asyncio.Lock()
+
+# Cheap summary of everything the weekly report shows: the window's review
+# count and newest review, the newest analysis rows (ids grow on every insert
+# or replace) and the action plan themes
+REPORT_FINGERPRINT_QUERY = '''
+SELECT
+    (SELECT COUNT(*) FROM reviews WHERE date_added >= ?),
+    (SELECT MAX(date_added) FROM reviews),
+    (SELECT MAX(id) FROM sentiment),
+    (SELECT MAX(id) FROM priorities),
+    (SELECT MAX(id) FROM categories),
+    (SELECT COUNT(*) || ':' || MAX(id) || ':' || TOTAL(review_count) FROM action_plans)
+'''
+
+# Every breakdown for the weekly report in one query: the recent reviews
+# are selected once, each aggregate is tagged by kind, and only the top five
+# categories are returned. CROSS JOIN keeps the week's reviews as the outer
+# loop, so each joined table is probed through its review_id index instead
+# of being scanned whole
+WEEKLY_BREAKDOWN_QUERY = '''
+WITH recent AS (
+    SELECT review_id, rating FROM reviews
+    WHERE date_added >= ?
+)
+SELECT 'rating' AS kind, rating AS bucket, COUNT(*) AS count FROM recent
+GROUP BY rating
+UNION ALL
+SELECT 'sentiment', s.sentiment, COUNT(*) FROM recent r
+CROSS JOIN sentiment s ON r.review_id = s.review_id
+GROUP BY s.sentiment
+UNION ALL
+SELECT 'priority', p.priority_level, COUNT(*) FROM recent r
+CROSS JOIN priorities p ON r.review_id = p.review_id
+GROUP BY p.priority_level
+UNION ALL
+SELECT * FROM (
+    SELECT 'category', c.category, COUNT(*) AS category_count FROM recent r
+    CROSS JOIN categories c ON r.review_id = c.review_id
+    GROUP BY c.category
+    ORDER BY category_count DESC, c.category
+    LIMIT 5
+)
+UNION ALL
+SELECT 'theme', title, review_count FROM action_plans
+'''
+
+# The same breakdowns summed from the per-day rollups in metrics_daily. The
+# rollups are per calendar day, so the window starts at midnight of the
+# cutoff day: it also counts reviews from earlier on that day, up to a day
+# more than the exact seven days WEEKLY_BREAKDOWN_QUERY covers
+DAILY_METRICS_QUERY = '''
+WITH weekly AS (
+    SELECT kind,
+           CASE WHEN kind IN ('rating', 'priority') THEN CAST(bucket AS INTEGER) ELSE bucket END AS bucket,
+           SUM(count) AS total
+    FROM metrics_daily
+    WHERE day >= date(?)
+    GROUP BY kind, bucket
+)
+SELECT kind, bucket, total AS count FROM weekly
+WHERE kind != 'category'
+UNION ALL
+SELECT * FROM (
+    SELECT kind, bucket, total FROM weekly
+    WHERE kind = 'category'
+    ORDER BY total DESC, bucket
+    LIMIT 5
+)
+UNION ALL
+SELECT 'theme', title, review_count FROM action_plans
+'''
+
+# Rendered weekly reports by day: {day: (fingerprint, report, checked_at)}
+REPORT_CACHE_SIZE = 32
+_report_cache = OrderedDict()
+
+# The cache is filled on database worker threads and cleared on the event
+# loop. Clearing bumps the generation, so a report built from data read
+# before the clear is not stored afterwards
+_report_cache_lock = threading.Lock()
+_report_cache_generation = 0
+
+# Seconds a cached report is served without re-checking its fingerprint.
+# The bot's own writes (/process, /steps, /reset) clear the cache
+REPORT_CACHE_TTL = 60
+
+# Set once metrics_daily is known to have rows; the rollups are only removed
+# by /reset, so until then the weekly report does not probe for them again.
+# Read and written under _report_cache_lock
+_metrics_ready = False
+
+# Telegram Markdown control characters: escaped in user-provided text, or
+# stripped when falling back to a plain text message
+ESCAPE_MARKDOWN = str.maketrans({'*': '\\*', '_': '\\_', '`': '\\`', '[': '\\['})
+STRIP_MARKDOWN = str.maketrans('', '', '*_')
+
+# Static bot messages; only the user's mention is filled into the welcome
+# message per /start
+WELCOME_TEMPLATE = (
+    "👋 Hello {mention}!\n\n"
+    "Welcome to the App Review Bot. I help you monitor and analyze app reviews from Google Play Store.\n\n"
+    "Here are the commands you can use:\n"
+    "• /process - Scrape and analyze new app reviews\n"
+    "• /report - Get a weekly summary of reviews\n"
+    "• /steps - Get action plans for high-priority issues\n"
+    "• /export - Download reviews as a CSV file\n"
+    "• /help - Show this help message\n\n"
+    "To get started, use /process to collect and analyze app reviews."
+)
+
+HELP_MESSAGE = (
+    "📋 *App Review Bot Commands*\n\n"
+    "*/process* - Scrape new reviews from Google Play, analyze sentiment, categorize, and assign priorities\n\n"
+    "*/report* - Get a weekly summary of reviews including sentiment breakdown and common issues\n\n"
+    "*/steps* - Generate action plans for high-priority issues (*/steps refresh* regenerates them)\n\n"
+    "*/export* - Download analyzed reviews as a CSV file (last 7 days)\n\n"
+    "*/reset* - Clear the database and start fresh (use with caution)\n\n"
+    "*/help* - Show this help message"
+)
+
+# Priority level labels in the weekly report, padded for alignment; levels
+# outside the table are formatted only when they occur
+PRIORITY_LABELS = {
+    1: "🔴 Critical",
+    2: "🟠 High   ",
+    3: "🟡 Medium ",
+    4: "🟢 Low    ",
+    5: "🔵 Minimal"
+}
+
+# Sentiment emoji in the weekly report; anything else is shown as negative
+SENTIMENT_EMOJI = {"Positive": "😊", "Neutral": "😐"}
+
+# Rating labels in the weekly report, padded for alignment
+RATING_LABELS = {
+    1: "⭐ 1 star ",
+    2: "⭐ 2 stars",
+    3: "⭐ 3 stars",
+    4: "⭐ 4 stars",
+    5: "⭐ 5 stars"
+}
+
+# Appended to the weekly report until sentiment analysis has run
+SENTIMENT_NOTE = "\n_Note: Sentiment analysis has not been performed yet. Use /process to analyze reviews._"
+
+# Star strings for ratings 0-5
+STAR_STRINGS = tuple("⭐" * n for n in range(6))
+
+# Longest reply sent as one message, with a margin under Telegram's 4096 characters
+MESSAGE_CHUNK_LIMIT = 4000
+
+# Priority emoji in the high priority fallback list; level 2 and anything else is high
+PRIORITY_EMOJI = {1: "🔴"}
+
+# Minimum seconds between progress edits of a status message; a Telegram
+# round trip takes a few hundred milliseconds and a status that is replaced
+# right away is not worth one
+STATUS_EDIT_INTERVAL = 0.75
+
 # Ensure all handlers are exposed
 __all__ = [
     'start_command', 'help_command', 'report_command', 
@@ -24,24 +196,135 @@ __all__ = [
     'handle_reset_confirmation', 'handle_theme_selection', 'export_command'
 ]
 
+# Every table created by setup_database, children before the reviews they
+# reference; /reset empties exactly these and nothing else
+_RESET_TABLES = (
+    'sentiment', 'categories', 'priorities', 'reviews', 'action_plans',
+    'prompt_cache', 'review_cache', 'metrics_daily', 'meta'
+)
+
+# The reset as one script and one write transaction, built from the fixed list
+_RESET_SCRIPT = "BEGIN IMMEDIATE;\n" + "".join(f"DELETE FROM {table};\n" for table in _RESET_TABLES) + "COMMIT;"
+
+def escape_markdown(text) -> str:
+    """Escape Markdown control characters in one pass"""
+    return str(text).translate(ESCAPE_MARKDOWN)
+
+def truncate(text: str) -> str:
+    """Shorten text longer than 100 characters to 97 plus an ellipsis"""
+    return text[:97] + "..." if len(text) > 100 else text
+
+def review_preview(text: str) -> str:
+    """
+    Shorten a review for display and escape it for Markdown. Truncating first
+    means only the shown text is escaped and an escape is never cut in half
+    """
+    return escape_markdown(truncate(text))
+
+def pack_message(parts) -> list:
+    """
+    Pack message parts into as few messages as fit under MESSAGE_CHUNK_LIMIT
+    
+    Args:
+        parts: Message pieces in order; a piece is only split if it is longer
+            than the limit by itself
+    
+    Returns:
+        List of message texts
+    """
+    chunks = []
+    current = []
+    current_length = 0
+    for part in parts:
+        while len(part) > MESSAGE_CHUNK_LIMIT:
+            if current:
+                chunks.append("".join(current))
+                current, current_length = [], 0
+            chunks.append(part[:MESSAGE_CHUNK_LIMIT])
+            part = part[MESSAGE_CHUNK_LIMIT:]
+        if current_length + len(part) > MESSAGE_CHUNK_LIMIT:
+            chunks.append("".join(current))
+            current, current_length = [], 0
+        current.append(part)
+        current_length += len(part)
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+def split_message(text: str) -> list:
+    """Split text longer than MESSAGE_CHUNK_LIMIT into messages at line breaks"""
+    if len(text) <= MESSAGE_CHUNK_LIMIT:
+        return [text]
+    return pack_message(text.splitlines(keepends=True))
+
+class Debouncer:
+    """
+    Coalesces progress edits of a status message
+    
+    An intermediate status is sent in the background, and only if at least
+    `min_interval` seconds passed since the previous edit; otherwise it is
+    dropped. The final text always goes out, after any pending edit.
+    """
+    
+    def __init__(self, message, min_interval: float = STATUS_EDIT_INTERVAL):
+        self.message = message
+        self.min_interval = min_interval
+        # Nothing has been edited yet, so the first status always goes out
+        self._last = -min_interval
+        self._pending = None
+    
+    async def _edit(self, text: str):
+        try:
+            await self.message.edit_text(text)
+        except Exception as e:
+            logger.error(f"Error updating status message: {e}")
+    
+    async def set(self, text: str):
+        """Show an intermediate status unless the previous edit was too recent"""
+        now = time.monotonic()
+        if now - self._last < self.min_interval or (self._pending and not self._pending.done()):
+            return
+        self._last = now
+        self._pending = asyncio.create_task(self._edit(text))
+    
+    async def finish(self, text: str, **kwargs):
+        """Show the final text once the pending status edit has gone out"""
+        if self._pending:
+            await self._pending
+            self._pending = None
+        self._last = time.monotonic()
+        return await self.message.edit_text(text, **kwargs)
+
+def clear_all_tables(conn):
+    """Delete all rows from every application table"""
+    from analysis.sentiment_analysis import clear_sentiment_cache
+    
+    global _metrics_ready
+    cursor = conn.cursor()
+    
+    # executescript commits anything pending, then runs the fixed script
+    cursor.executescript(_RESET_SCRIPT)
+    
+    # Sentiment results saved by an unfinished run belong to the deleted
+    # reviews, so they must not be reused
+    clear_sentiment_cache()
+    
+    # The rollups are gone, so the weekly report probes for them again
+    with _report_cache_lock:
+        _metrics_ready = False
+    
+    # Give the freed pages back to the file system
+    try:
+        cursor.execute('VACUUM')
+    except sqlite3.Error as e:
+        logger.error(f"Error vacuuming database after reset: {e}")
+
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Send a message when the command /start is issued."""
     user = update.effective_user
     logger.info(f"User {user.id} started the bot")
     
-    welcome_message = (
-        f"👋 Hello {user.mention_html()}!\n\n"
-        f"Welcome to the App Review Bot. I help you monitor and analyze app reviews from Google Play Store.\n\n"
-        f"Here are the commands you can use:\n"
-        f"• /process - Scrape and analyze new app reviews\n"
-        f"• /report - Get a weekly summary of reviews\n"
-        f"• /steps - Get action plans for high-priority issues\n"
-        f"• /export - Download reviews as a CSV file\n"
-        f"• /help - Show this help message\n\n"
-        f"To get started, use /process to collect and analyze app reviews."
-    )
-    
-    await update.message.reply_html(welcome_message)
+    await update.message.reply_html(WELCOME_TEMPLATE.format(mention=user.mention_html()))
 
 async def reset_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Reset the database by clearing all tables."""
@@ -56,7 +339,7 @@ async def reset_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Store the original user's ID to check replies
         context.user_data['awaiting_reset_confirmation'] = True
         context.user_data['reset_request_user_id'] = update.effective_user.id
-        
+    
     except Exception as e:
         logger.error(f"Error in reset command: {e}")
         await update.message.reply_text(f"Error: {str(e)}")
@@ -79,29 +362,14 @@ async def handle_reset_confirmation(update: Update, context: ContextTypes.DEFAUL
     
     if response == 'yes':
         try:
-            # Connect to the database
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            
-            # Get a list of all tables
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = cursor.fetchall()
-            
-            # Clear all tables
-            for table in tables:
-                table_name = table[0]
-                if table_name != 'sqlite_sequence':  # Skip the SQLite internal table
-                    cursor.execute(f"DELETE FROM {table_name}")
-            
-            # Commit the changes
-            conn.commit()
-            conn.close()
+            await run_db(clear_all_tables)
+            clear_report_cache()
             
             await update.message.reply_text(
                 "✅ Database has been reset. All reviews and analysis data have been deleted.\n"
                 "Use /process to fetch and analyze new reviews."
             )
-            
+        
         except Exception as e:
             logger.error(f"Error resetting database: {e}")
             await update.message.reply_text(f"Error resetting database: {str(e)}")
@@ -117,184 +385,224 @@ async def handle_reset_confirmation(update: Update, context: ContextTypes.DEFAUL
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Send a message when the command /help is issued."""
-    help_message = (
-        "📋 *App Review Bot Commands*\n\n"
-        "*/process* - Scrape new reviews from Google Play, analyze sentiment, categorize, and assign priorities\n\n"
-        "*/report* - Get a weekly summary of reviews including sentiment breakdown and common issues\n\n"
-        "*/steps* - Generate action plans for high-priority issues\n\n"
-        "*/export* - Download analyzed reviews as a CSV file (last 7 days)\n\n"
-        "*/reset* - Clear the database and start fresh (use with caution)\n\n"
-        "*/help* - Show this help message"
+    await update.message.reply_markdown(HELP_MESSAGE)
+
+def render_ratings(ratings, inv_pct: float) -> str:
+    """Render the rating breakdown section of the weekly report"""
+    return "".join([
+        "*Rating Breakdown:*\n",
+        *(f"{RATING_LABELS.get(rating) or f'⭐ {rating} stars'} — {count} ({count * inv_pct:.0f}%)\n"
+          for rating, count in ratings)
+    ])
+
+def render_sentiments(sentiments, inv_pct: float) -> str:
+    """Render the sentiment section of the weekly report"""
+    if not sentiments:
+        return ""
+    return "".join([
+        "*Sentiment:*\n",
+        *(f"{SENTIMENT_EMOJI.get(sentiment, '😞')} {sentiment} — {count} ({count * inv_pct:.0f}%)\n"
+          for sentiment, count in sentiments),
+        "\n"
+    ])
+
+def render_categories(top_categories, inv_pct: float) -> str:
+    """Render the top categories section of the weekly report, escaping the names"""
+    if not top_categories:
+        return ""
+    return "".join([
+        "*Top Categories:*\n",
+        *(f"• {escape_markdown(category)} — {count} ({count * inv_pct:.0f}%)\n" for category, count in top_categories),
+        "\n"
+    ])
+
+def render_priorities(priorities, inv_pct: float) -> str:
+    """Render the priority levels section of the weekly report"""
+    if not priorities:
+        return ""
+    return "".join([
+        "*Priority Levels:*\n",
+        *(f"{PRIORITY_LABELS.get(priority) or f'Priority {priority}'} — {count} ({count * inv_pct:.0f}%)\n"
+          for priority, count in priorities),
+        "\n"
+    ])
+
+def render_themes(themes) -> str:
+    """Render the key issue themes section of the weekly report, escaping the titles"""
+    if not themes:
+        return ""
+    return "".join([
+        "*Key Issue Themes:*\n",
+        *(f"• {escape_markdown(title)} — {count} reviews\n" for title, count in themes),
+        "\n→ Use /steps to view action plans for these issues\n",
+        "→ Use /export to download reviews as CSV"
+    ])
+
+def build_weekly_report(cursor, one_week_ago: str):
+    """
+    Query the past week's breakdowns and render the report message
+    
+    Args:
+        cursor: Database cursor
+        one_week_ago: ISO timestamp of the start of the report window
+    
+    Returns:
+        Markdown report text, or None if there are no reviews in the window
+    """
+    # Use the per-day rollups refreshed by /process once they exist, and
+    # aggregate the reviews directly before that
+    global _metrics_ready
+    with _report_cache_lock:
+        metrics_ready = _metrics_ready
+    if not metrics_ready:
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM metrics_daily)')
+        metrics_ready = bool(cursor.fetchone()[0])
+        if metrics_ready:
+            with _report_cache_lock:
+                _metrics_ready = True
+    query = DAILY_METRICS_QUERY if metrics_ready else WEEKLY_BREAKDOWN_QUERY
+    cursor.row_factory = sqlite3.Row
+    cursor.execute(query, (one_week_ago,))
+    rows = cursor.fetchall()
+    
+    breakdowns = {'rating': [], 'sentiment': [], 'priority': [], 'category': [], 'theme': []}
+    for row in rows:
+        breakdowns[row['kind']].append((row['bucket'], row['count']))
+    
+    # The total and the average both come from the rating distribution,
+    # summed in one pass over its (at most five) rows
+    ratings = sorted(breakdowns['rating'], reverse=True)
+    total_reviews = 0
+    total_rating_points = 0
+    for rating, count in ratings:
+        total_reviews += count
+        total_rating_points += rating * count
+    if total_reviews == 0:
+        return None
+    
+    sentiments = breakdowns['sentiment']
+    priorities = sorted(breakdowns['priority'])
+    top_categories = sorted(breakdowns['category'], key=lambda item: item[1], reverse=True)
+    themes = sorted(breakdowns['theme'], key=lambda item: item[1], reverse=True)
+    
+    # Calculate average rating
+    average_rating = total_rating_points / total_reviews
+    
+    # Percentages below are count * inv_pct
+    inv_pct = 100.0 / total_reviews
+    
+    # Each section renders to "" when there is nothing to show
+    return (
+        f"📊 *Weekly Review Summary*\n"
+        f"📝 Total Reviews: {total_reviews}  \n"
+        f"⭐ Average Rating: {average_rating:.1f}  \n\n"
+        f"{render_ratings(ratings, inv_pct)}\n"
+        f"{render_sentiments(sentiments, inv_pct)}"
+        f"{render_categories(top_categories, inv_pct)}"
+        f"{render_priorities(priorities, inv_pct)}"
+        f"{render_themes(themes)}"
+        f"{'' if sentiments else SENTIMENT_NOTE}"
     )
+
+def get_weekly_report(conn, one_week_ago: str):
+    """
+    Get the weekly report, reusing the rendered report while nothing it
+    depends on has changed
+    
+    Args:
+        conn: Database connection
+        one_week_ago: ISO timestamp of the start of the report window
     
-    await update.message.reply_markdown(help_message)
+    Returns:
+        Markdown report text, or None if there are no reviews in the window
+    """
+    report_key = one_week_ago[:10]
+    with _report_cache_lock:
+        generation = _report_cache_generation
+        cached = _report_cache.get(report_key)
+    
+    cursor = conn.cursor()
+    cursor.execute(REPORT_FINGERPRINT_QUERY, (one_week_ago,))
+    fingerprint = cursor.fetchone()
+    
+    if cached is not None and cached[0] == fingerprint:
+        report = cached[1]
+    else:
+        report = build_weekly_report(cursor, one_week_ago)
+    
+    with _report_cache_lock:
+        if generation == _report_cache_generation:
+            _report_cache[report_key] = (fingerprint, report, time.monotonic())
+            _report_cache.move_to_end(report_key)
+            if len(_report_cache) > REPORT_CACHE_SIZE:
+                _report_cache.popitem(last=False)
+    return report
+
+def get_checked_report(report_key: str):
+    """
+    Get the cached report for a day if its fingerprint was checked within
+    the last REPORT_CACHE_TTL seconds
+    
+    Returns:
+        Tuple of (fingerprint, report, checked_at), or None
+    """
+    with _report_cache_lock:
+        cached = _report_cache.get(report_key)
+    if cached is not None and time.monotonic() - cached[2] < REPORT_CACHE_TTL:
+        return cached
+    return None
+
+def clear_report_cache():
+    """Drop all cached reports after the bot changes the data they show"""
+    global _report_cache_generation
+    with _report_cache_lock:
+        _report_cache_generation += 1
+        _report_cache.clear()
 
 async def report_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Generate a weekly report of app reviews."""
-    import sqlite3
-    from database.sqlite_db import DB_PATH
-    from datetime import datetime, timedelta
-    
     try:
-        # Indicate processing has started
-        processing_message = await update.message.reply_text(
-            "📊 Generating weekly report, please wait..."
-        )
-        
-        # Connect to the database
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
         # Calculate the date one week ago
         one_week_ago = (datetime.now() - timedelta(days=7)).isoformat()
         
-        # Get total number of reviews in the last week
-        cursor.execute('''
-        SELECT COUNT(*) FROM reviews 
-        WHERE date_added >= ?
-        ''', (one_week_ago,))
-        total_reviews = cursor.fetchone()[0]
+        # Indicate processing has started; a recently checked report is sent
+        # without touching the database, otherwise the report is queried
+        # while the status message is on its way
+        cached = get_checked_report(one_week_ago[:10])
+        status_reply = update.message.reply_text(
+            "📊 Generating weekly report, please wait..."
+        )
+        if cached is not None:
+            processing_message = await status_reply
+            report = cached[1]
+        else:
+            processing_message, report = await asyncio.gather(
+                status_reply,
+                run_db(get_weekly_report, one_week_ago)
+            )
         
-        if total_reviews == 0:
+        if report is None:
             await processing_message.edit_text(
                 "No reviews found from the past week. Use /process to fetch reviews first."
             )
             return
-            
-        # Get rating distribution and calculate average
-        cursor.execute('''
-        SELECT rating, COUNT(*) FROM reviews 
-        WHERE date_added >= ?
-        GROUP BY rating
-        ORDER BY rating DESC
-        ''', (one_week_ago,))
-        ratings = cursor.fetchall()
-        
-        # Calculate average rating
-        total_rating_points = sum(rating * count for rating, count in ratings)
-        average_rating = total_rating_points / total_reviews if total_reviews > 0 else 0
-        
-        # Get sentiment distribution (if any reviews have been analyzed)
-        cursor.execute('''
-        SELECT s.sentiment, COUNT(*) FROM reviews r
-        JOIN sentiment s ON r.review_id = s.review_id
-        WHERE r.date_added >= ?
-        GROUP BY s.sentiment
-        ''', (one_week_ago,))
-        sentiments = cursor.fetchall()
-        
-        # Get priority distribution (if any reviews have been prioritized)
-        cursor.execute('''
-        SELECT p.priority_level, COUNT(*) FROM reviews r
-        JOIN priorities p ON r.review_id = p.review_id
-        WHERE r.date_added >= ?
-        GROUP BY p.priority_level
-        ORDER BY p.priority_level
-        ''', (one_week_ago,))
-        priorities = cursor.fetchall()
-        
-        # Get top categories
-        try:
-            cursor.execute('''
-            SELECT c.category, COUNT(*) FROM reviews r
-            JOIN categories c ON r.review_id = c.review_id
-            WHERE r.date_added >= ?
-            GROUP BY c.category
-            ORDER BY COUNT(*) DESC
-            LIMIT 5
-            ''', (one_week_ago,))
-            top_categories = cursor.fetchall()
-        except sqlite3.OperationalError:
-            # If categories table doesn't exist yet
-            top_categories = []
-            
-        # Get current action plan themes
-        try:
-            cursor.execute('''
-            SELECT title, review_count FROM action_plans
-            ORDER BY review_count DESC
-            ''')
-            themes = cursor.fetchall()
-        except sqlite3.OperationalError:
-            # If action_plans table doesn't exist or has issues
-            themes = []
-        
-        # Close connection
-        conn.close()
-        
-        # Format and send report in the new format
-        report = f"📊 *Weekly Review Summary*\n"
-        report += f"📝 Total Reviews: {total_reviews}  \n"
-        report += f"⭐ Average Rating: {average_rating:.1f}  \n\n"
-        
-        # Add rating breakdown
-        report += "*Rating Breakdown:*\n"
-        for rating, count in ratings:
-            # Create aligned star ratings
-            stars = "⭐ " + str(rating) + " stars"
-            if rating == 1:
-                stars = "⭐ 1 star "  # Extra space for alignment
-                
-            percentage = (count / total_reviews) * 100
-            report += f"{stars} — {count} ({percentage:.0f}%)\n"
-        
-        report += "\n"
-        
-        # Add sentiment distribution if available
-        if sentiments:
-            report += "*Sentiment:*\n"
-            for sentiment, count in sentiments:
-                emoji = "😊" if sentiment == "Positive" else "😐" if sentiment == "Neutral" else "😞"
-                percentage = (count / total_reviews) * 100
-                report += f"{emoji} {sentiment} — {count} ({percentage:.0f}%)\n"
-            report += "\n"
-        
-        # Add top categories if available
-        if top_categories:
-            report += "*Top Categories:*\n"
-            for category, count in top_categories:
-                percentage = (count / total_reviews) * 100
-                report += f"• {category} — {count} ({percentage:.0f}%)\n"
-            report += "\n"
-        
-        # Add priority distribution if available
-        if priorities:
-            report += "*Priority Levels:*\n"
-            priority_labels = {
-                1: "🔴 Critical",
-                2: "🟠 High   ",
-                3: "🟡 Medium ",
-                4: "🟢 Low    ",
-                5: "🔵 Minimal"
-            }
-            for priority, count in priorities:
-                percentage = (count / total_reviews) * 100
-                label = priority_labels.get(priority, f"Priority {priority}")
-                report += f"{label} — {count} ({percentage:.0f}%)\n"
-            report += "\n"
-            
-        # Add current themes if available
-        if themes:
-            report += "*Key Issue Themes:*\n"
-            for title, count in themes:
-                report += f"• {title} — {count} reviews\n"
-            report += "\n"
-            report += "→ Use /steps to view action plans for these issues\n"
-            report += "→ Use /export to download reviews as CSV"
-        
-        # Add note if sentiment analysis hasn't been done yet
-        if not sentiments:
-            report += "\n_Note: Sentiment analysis has not been performed yet. Use /process to analyze reviews._"
-            
+        
+        # A report with many action plan themes continues in further messages
+        first_chunk, *more_chunks = split_message(report)
+        
         # Try to send with Markdown, fallback to plain text if needed
         try:
-            await processing_message.edit_text(report, parse_mode='Markdown')
+            await processing_message.edit_text(first_chunk, parse_mode='Markdown')
+            for chunk in more_chunks:
+                await update.message.reply_markdown(chunk)
         except Exception as e:
             logger.error(f"Error sending report with markdown: {e}")
             # Send without formatting
-            plain_report = report.replace("*", "").replace("_", "")
-            await processing_message.edit_text(plain_report)
-        
+            first_chunk, *more_chunks = split_message(report.translate(STRIP_MARKDOWN))
+            await processing_message.edit_text(first_chunk)
+            for chunk in more_chunks:
+                await update.message.reply_text(chunk)
+    
     except Exception as e:
         logger.error(f"Error in report command: {e}")
         await update.message.reply_text(f"Error generating report: {str(e)}")
@@ -305,91 +613,101 @@ async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Indicate processing has started
         message = await update.message.reply_text("📤 Exporting latest analyzed reviews...")
         
-        # Generate the CSV file
-        csv_file = generate_reviews_csv(DB_PATH)
+        from utils.export import generate_reviews_csv
+        
+        # Generate the CSV on a read connection in a worker thread so the
+        # queries neither stall the event loop nor hold up other commands; it
+        # is built in memory, so there is no file to clean up
+        export = await run_db_read(generate_reviews_csv)
         
-        if not csv_file:
+        if not export:
             await message.edit_text(
                 "No reviews found to export. Use /process to fetch and analyze reviews first."
             )
             return
         
         # Send the file
-        with open(csv_file, 'rb') as file:
+        filename, csv_buffer = export
+        with csv_buffer:
             await context.bot.send_document(
                 chat_id=update.effective_chat.id,
-                document=file,
-                filename=os.path.basename(csv_file)
+                document=csv_buffer,
+                filename=filename
             )
-            
-        # Delete the temporary file
-        try:
-            os.remove(csv_file)
-            logger.info(f"Temporary CSV file {csv_file} deleted successfully")
-        except Exception as e:
-            logger.error(f"Error deleting temporary CSV file: {e}")
-        
+    
     except Exception as e:
         logger.error(f"Error in export command: {e}")
         await update.message.reply_text(f"Error exporting reviews: {str(e)}")
 
+def get_stored_action_plans(conn):
+    """Get the stored action plans and whether they are still current"""
+    from analysis.action_plans import get_action_plans, action_plans_are_current
+    
+    return get_action_plans(conn), action_plans_are_current(conn)
+
 async def steps_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Generate action plans for high-priority issues and let user select a theme."""
-    from utils.config import load_config
+    from analysis.action_plans import get_high_priority_reviews, generate_review_action_plans, save_action_plans
     
     try:
-        # Indicate processing has started
-        processing_message = await update.message.reply_text(
-            "🔍 Analyzing high-priority issues and identifying themes..."
+        # Indicate processing has started while the stored action plans load
+        processing_message, (action_plans, plans_current) = await asyncio.gather(
+            update.message.reply_text(
+                "🔍 Analyzing high-priority issues and identifying themes..."
+            ),
+            run_db(get_stored_action_plans)
         )
-        
-        # Connect to database
-        conn = sqlite3.connect(DB_PATH)
-        
-        # Get action plans from database
-        action_plans = get_action_plans(conn)
-        
-        # If no action plans, generate them
-        if not action_plans:
+        status = Debouncer(processing_message)
+        
+        # Stored plans are shown as they are, since generating them costs
+        # OpenAI calls; they are only generated when there are none yet or
+        # when asked for with /steps refresh
+        refresh = bool(context.args) and context.args[0].lower() == 'refresh'
+        api_key = None
+        if not action_plans or refresh:
             # Load configuration to get OpenAI API key
             config = load_config()
             api_key = config.get('OPENAI_API_KEY')
             
-            if not api_key:
-                await processing_message.edit_text(
+            if not api_key and not action_plans:
+                await status.finish(
                     "⚠️ OpenAI API key not configured. Cannot generate action plans.\n"
                     "Please set OPENAI_API_KEY in your .env file."
                 )
                 return
-                
-            # Get high priority reviews
-            high_priority_reviews = get_high_priority_reviews(conn)
+        
+        if api_key:
+            # Update status
+            await status.set("🧩 Clustering high-priority reviews into themes and generating action plans...")
+            
+            # Load the high priority reviews, then generate the action plans in
+            # a worker thread without holding the shared connection, so other
+            # commands can use the database during the OpenAI calls
+            high_priority_reviews = await run_db_read(get_high_priority_reviews)
+            result = await asyncio.to_thread(generate_review_action_plans, high_priority_reviews, api_key)
             
-            if not high_priority_reviews:
-                await processing_message.edit_text(
+            if not result['source_count']:
+                await status.finish(
                     "ℹ️ No high-priority issues found. Either there are no critical issues, "
                     "or reviews need to be processed first with /process."
                 )
                 return
-                
-            # Update status
-            await processing_message.edit_text(
-                f"🧩 Found {len(high_priority_reviews)} high-priority reviews. "
-                f"Clustering into themes and generating action plans..."
-            )
-            
-            # Generate action plans
-            action_plans = generate_action_plans(conn, api_key)
             
-            # Save action plans to database
-            if action_plans:
-                save_action_plans(conn, action_plans)
-            else:
+            # Save action plans to database, keeping the stored ones if
+            # generation failed
+            if result['plans']:
+                action_plans = result['plans']
+                plans_current = True
+                await run_db(save_action_plans, action_plans)
+                clear_report_cache()
+            elif not action_plans:
                 # Just list some high priority reviews if we couldn't generate plans
                 limited_reviews = high_priority_reviews[:5]  # Limit to 5 reviews
                 
-                message = "🚨 *High Priority Issues*\n\n"
-                message += "Could not generate themed action plans. Here are the current high priority issues:\n\n"
+                parts = [
+                    "🚨 *High Priority Issues*\n\n",
+                    "Could not generate themed action plans. Here are the current high priority issues:\n\n"
+                ]
                 
                 for i, review in enumerate(limited_reviews, 1):
                     # Format categories
@@ -397,37 +715,36 @@ async def steps_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     categories_text = ", ".join(categories) if categories else "Not categorized"
                     
                     # Priority emoji
-                    priority_emoji = "🔴" if review.get('priority_level', 0) == 1 else "🟠"
+                    priority_emoji = PRIORITY_EMOJI.get(review.get('priority_level'), "🟠")
                     
                     # Format review preview - Ensure proper escaping for markdown
-                    review_text = review['review_text']
-                    # Escape markdown special characters
-                    review_text = review_text.replace("*", "\\*").replace("_", "\\_").replace("`", "\\`").replace("[", "\\[")
-                    if len(review_text) > 100:
-                        review_text = review_text[:97] + "..."
-                        
+                    review_text = review_preview(review['review_text'])
+                    
                     # Add to message
-                    message += (
+                    parts.append(
                         f"*Issue {i}:* {priority_emoji} {categories_text}\n"
-                        f"Rating: {'⭐' * review['rating']}\n"
+                        f"Rating: {STAR_STRINGS[review['rating']]}\n"
                         f"_{review_text}_\n\n"
                     )
                 
                 try:
-                    await processing_message.edit_text(message, parse_mode='Markdown')
+                    await status.finish("".join(parts), parse_mode='Markdown')
                 except Exception as e:
                     # If markdown parsing fails, send without formatting
                     logger.error(f"Error with markdown formatting: {e}")
                     simple_message = "🚨 High Priority Issues\n\n" + "\n".join([r['review_text'][:100] for r in limited_reviews])
-                    await processing_message.edit_text(simple_message)
+                    await status.finish(simple_message)
                 return
         
         # Display the list of themes for selection
-        themes_list = "🚨 *Action Plan Themes Identified*\n\n"
-        themes_list += "Select a theme number to see the detailed action plan:\n\n"
-        
-        # Store action plans in user data for later reference
-        context.user_data['action_plans'] = action_plans
+        parts = [
+            "🚨 *Action Plan Themes Identified*\n\n",
+            "Select a theme number to see the detailed action plan:\n\n"
+        ]
+        
+        # Store only the theme titles in user data; the selected plan is read
+        # back from the database
+        context.user_data['plan_titles'] = [plan['title'] for plan in action_plans]
         context.user_data['awaiting_theme_selection'] = True
         context.user_data['theme_selection_user_id'] = update.effective_user.id
         
@@ -436,23 +753,32 @@ async def steps_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             review_count = plan.get('review_count', 0)
             
             # Escape markdown special characters
-            safe_title = title.replace("*", "\\*").replace("_", "\\_").replace("`", "\\`").replace("[", "\\[")
+            safe_title = escape_markdown(title)
             
-            themes_list += f"*{i}.* {safe_title} ({review_count} reviews)\n"
+            parts.append(f"*{i}.* {safe_title} ({review_count} reviews)\n")
+        
+        parts.append("\nReply with the number of the theme you want to explore.")
+        if not plans_current:
+            parts.append("\n\nℹ️ High-priority reviews changed since these plans were generated. Use /steps refresh to regenerate them.")
         
-        themes_list += "\nReply with the number of the theme you want to explore."
+        # The status message shows the first chunk; a long list continues in
+        # as few further messages as fit
+        first_chunk, *more_chunks = pack_message(parts)
         
         try:
-            await processing_message.edit_text(themes_list, parse_mode='Markdown')
+            await status.finish(first_chunk, parse_mode='Markdown')
+            for chunk in more_chunks:
+                await update.message.reply_markdown(chunk)
         except Exception as e:
             logger.error(f"Error with markdown in themes list: {e}")
             # Fallback to plain text
-            simple_list = "Action Plan Themes Identified:\n\n"
-            for i, plan in enumerate(action_plans, 1):
-                simple_list += f"{i}. {plan['title']} ({plan.get('review_count', 0)} reviews)\n"
-            simple_list += "\nReply with the number of the theme you want to explore."
-            await processing_message.edit_text(simple_list)
-        
+            simple_list = "".join([
+                "Action Plan Themes Identified:\n\n",
+                *(f"{i}. {plan['title']} ({plan.get('review_count', 0)} reviews)\n" for i, plan in enumerate(action_plans, 1)),
+                "\nReply with the number of the theme you want to explore."
+            ])
+            await status.finish(simple_list)
+    
     except Exception as e:
         logger.error(f"Error in steps command: {e}")
         await update.message.reply_text(f"Error retrieving action plans: {str(e)}")
@@ -473,93 +799,76 @@ async def handle_theme_selection(update: Update, context: ContextTypes.DEFAULT_T
     try:
         selection = int(selection_text)
         
-        # Get the action plans from user data
-        action_plans = context.user_data.get('action_plans', [])
+        # Get the theme titles from user data
+        plan_titles = context.user_data.get('plan_titles', [])
         
         # Check if the selection is valid
-        if selection < 1 or selection > len(action_plans):
+        if selection < 1 or selection > len(plan_titles):
             await update.message.reply_text(
-                f"Please select a valid theme number between 1 and {len(action_plans)}."
+                f"Please select a valid theme number between 1 and {len(plan_titles)}."
             )
             return
         
+        from analysis.action_plans import get_action_plan
+        
         # Get the selected action plan
-        plan = action_plans[selection - 1]
+        plan = await run_db_read(get_action_plan, plan_titles[selection - 1])
+        if plan is None:
+            await update.message.reply_text(
+                "That theme is no longer available. Type /steps to see the current themes."
+            )
+            return
         
         # Format the detailed action plan
         title = plan['title']
         summary = plan.get('summary', 'No summary available')
         
-        # Handle action_steps - could be JSON string or list
         action_steps = plan.get('action_steps', [])
-        if isinstance(action_steps, str):
-            try:
-                action_steps = json.loads(action_steps)
-            except:
-                # If parsing fails, treat as a single item
-                action_steps = [action_steps]
         
         # Ensure proper escaping for markdown
-        title = title.replace("*", "\\*").replace("_", "\\_").replace("`", "\\`").replace("[", "\\[")
-        summary = summary.replace("*", "\\*").replace("_", "\\_").replace("`", "\\`").replace("[", "\\[")
-        
-        # Format action steps with proper escaping
-        steps_text = ""
-        for step in action_steps:
-            # Escape markdown special characters in each step
-            safe_step = str(step).replace("*", "\\*").replace("_", "\\_").replace("`", "\\`").replace("[", "\\[")
-            steps_text += f"• {safe_step}\n"
+        title = escape_markdown(title)
+        summary = escape_markdown(summary)
         
         # Get user response with proper escaping
         user_response = plan.get('user_response', 'No suggested response available')
-        user_response = user_response.replace("*", "\\*").replace("_", "\\_").replace("`", "\\`").replace("[", "\\[")
+        user_response = escape_markdown(user_response)
         
         review_count = plan.get('review_count', 0)
         
-        # Try to get review samples from JSON if available
-        review_samples = []
-        if isinstance(plan.get('review_samples'), str):
-            try:
-                review_samples = json.loads(plan.get('review_samples', '[]'))
-            except:
-                review_samples = []
-        else:
-            review_samples = plan.get('review_samples', [])
-        
-        # Format sample reviews with proper escaping
-        samples_text = ""
-        if review_samples:
-            samples_text = "\n*Sample Reviews:*\n"
-            for j, sample in enumerate(review_samples, 1):
-                # Escape markdown special characters
-                safe_sample = str(sample).replace("*", "\\*").replace("_", "\\_").replace("`", "\\`").replace("[", "\\[")
-                if len(safe_sample) > 100:
-                    safe_sample = safe_sample[:97] + "..."
-                samples_text += f"_{j}. \"{safe_sample}\"_\n"
-        
-        # Build the detailed message
-        detailed_message = (
-            f"*Action Plan for Theme: {title}* ({review_count} reports)\n\n"
-            f"*Summary:* {summary}\n\n"
-            f"*Action Steps:*\n{steps_text}\n"
-            f"*Suggested User Response:*\n{user_response}\n"
-            f"{samples_text}\n\n"
-            f"Type /steps to see all themes again.\n"
-            f"Use /export to download all reviews as CSV."
-        )
+        review_samples = plan.get('review_samples', [])
+        
+        # Escaped action steps, shared by the markdown and plain text messages.
+        # The bullets add no Markdown characters, so the joined list is
+        # escaped in a single pass
+        steps_text = escape_markdown("".join(f"• {step}\n" for step in action_steps))
+        
+        # Build the detailed message, escaping the sample reviews as they are
+        # added, packed into as few messages as fit
+        detailed_messages = pack_message([
+            f"*Action Plan for Theme: {title}* ({review_count} reports)\n\n",
+            f"*Summary:* {summary}\n\n",
+            "*Action Steps:*\n",
+            steps_text,
+            f"\n*Suggested User Response:*\n{user_response}\n",
+            "\n*Sample Reviews:*\n" if review_samples else "",
+            *(f"_{j}. \"{review_preview(sample)}\"_\n" for j, sample in enumerate(review_samples, 1)),
+            "\n\nType /steps to see all themes again.\n",
+            "Use /export to download all reviews as CSV."
+        ])
         
         # Clear the selection flag
         context.user_data['awaiting_theme_selection'] = False
         
         # Send the detailed action plan
         try:
-            await update.message.reply_markdown(detailed_message)
+            for detailed_message in detailed_messages:
+                await update.message.reply_markdown(detailed_message)
         except Exception as e:
             # If markdown fails, try plain text
             logger.error(f"Error with markdown in detailed plan: {e}")
             simple_message = f"Action Plan for Theme: {title}\n\nSummary: {summary}\n\nAction Steps:\n{steps_text}\n"
             await update.message.reply_text(simple_message)
-            
+    
     except ValueError:
         await update.message.reply_text(
             "Please enter a valid number to select a theme. Type /steps to see the list again."
@@ -571,13 +880,72 @@ async def handle_theme_selection(update: Update, context: ContextTypes.DEFAULT_T
         )
 
 async def process_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Process new app reviews."""
-    from utils.config import load_config
-    from scraper.google_play_scraper import fetch_reviews
-    from database.sqlite_db import get_unprocessed_reviews
+    """Process new app reviews, one /process at a time."""
+    if PROCESS_LOCK.locked():
+        await update.message.reply_text("⏳ A processing job is already in progress — please wait for it to finish.")
+        return
     
+    async with PROCESS_LOCK:
+        await process_new_reviews(update, context)
+
+async def run_analysis(status: Debouncer, config):
+    """Analyze the unprocessed reviews and report the results in the status message"""
+    from analysis.analyze_reviews import analyze_app_reviews
+    
+    # Run analysis
+    loop = asyncio.get_running_loop()
+    results = await loop.run_in_executor(PROCESS_EXECUTOR, analyze_app_reviews, config)
+    await run_db(refresh_daily_metrics)
+    clear_report_cache()
+    
+    if results.get('batch_pending'):
+        await status.finish(
+            "⏳ The batch analysis job submitted earlier is still running.\n"
+            "Use /process again later to ingest its results."
+        )
+    elif results['success']:
+        # The new reviews and analysis rows leave the planner statistics stale
+        await run_db(analyze_database)
+        
+        # Format success message
+        reviews_processed = results['reviews_processed']
+        sentiment_processed = results.get('sentiment_processed', 0)
+        categories_processed = results.get('categories_processed', 0)
+        priorities_processed = results.get('priorities_processed', 0)
+        action_plans = results.get('action_plans_generated', 0)
+        processing_time = results.get('processing_time_seconds', 0)
+        batch_submitted = results.get('batch_submitted', 0)
+        
+        # Large backlogs are analyzed by the Batch API within 24 hours
+        batch_text = (
+            f"• Sent to batch analysis: {batch_submitted} reviews (use /process later to ingest them)\n"
+            if batch_submitted else ""
+        )
+        
+        success_message = (
+            f"✅ Analysis complete!\n\n"
+            f"📊 *Analysis Results:*\n"
+            f"• Reviews processed: {reviews_processed}\n"
+            f"• Sentiment analyzed: {sentiment_processed}\n"
+            f"• Categories assigned: {categories_processed}\n"
+            f"• Priorities assigned: {priorities_processed}\n"
+            f"• Action plans generated: {action_plans}\n"
+            f"{batch_text}"
+            f"• Processing time: {processing_time} seconds\n\n"
+            f"Use /report for a summary or /export to download reviews as CSV."
+        )
+        
+        await status.finish(success_message, parse_mode='Markdown')
+    else:
+        # Format error message
+        error = results.get('error', 'Unknown error')
+        await status.finish(f"❌ Error during analysis: {error}")
+
+async def process_new_reviews(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Fetch and analyze new app reviews."""
     # Indicate processing has started
     processing_message = await update.message.reply_text("🔍 Fetching new reviews from Google Play Store...")
+    status = Debouncer(processing_message)
     
     # Load configuration
     config = load_config()
@@ -586,65 +954,58 @@ async def process_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     max_reviews = config['MAX_REVIEWS']
     
     if not app_id:
-        await processing_message.edit_text("❌ Error: No app ID configured. Please set APP_ID in .env file.")
+        await status.finish("❌ Error: No app ID configured. Please set APP_ID in .env file.")
         return
     
+    from scraper.google_play_scraper import fetch_reviews
+    from analysis.batch_jobs import get_pending_backfill
+    
     # Fetch reviews
     try:
-        new_reviews_count = fetch_reviews(app_id, days, max_reviews)
+        # fetch_reviews saves the new reviews in one transaction and returns their IDs
+        loop = asyncio.get_running_loop()
+        new_review_ids = await loop.run_in_executor(PROCESS_EXECUTOR, fetch_reviews, app_id, days, max_reviews)
         
-        if new_reviews_count > 0:
-            await processing_message.edit_text(f"✅ Successfully fetched {new_reviews_count} new reviews!")
-            
-            # Get count of unprocessed reviews
-            unprocessed_reviews = get_unprocessed_reviews()
+        if new_review_ids:
+            fetched_text = f"✅ Successfully fetched {len(new_review_ids)} new reviews!\n\n"
             
-            # Check if OpenAI API key is configured
-            if not config.get('OPENAI_API_KEY'):
-                await update.message.reply_text(
+            # Check if OpenAI API key is configured; either way the status
+            # message is edited once to report the fetch and what comes next
+            api_key_configured = bool(config.get('OPENAI_API_KEY'))
+            if api_key_configured:
+                status_text = (
+                    f"{fetched_text}"
+                    f"🧠 Analyzing {len(new_review_ids)} reviews...\n"
+                    f"This may take a minute..."
+                )
+            else:
+                status_text = (
+                    f"{fetched_text}"
                     "⚠️ Warning: OpenAI API key not configured. Cannot proceed with analysis.\n"
                     "Please set OPENAI_API_KEY in your .env file."
                 )
-                return
-                
-            # Indicate that analysis is starting
-            analysis_message = await update.message.reply_text(
-                f"🧠 Analyzing {len(unprocessed_reviews)} reviews...\n"
-                f"This may take a minute..."
-            )
             
-            # Run analysis
-            results = analyze_app_reviews(config)
-            
-            if results['success']:
-                # Format success message
-                reviews_processed = results['reviews_processed']
-                sentiment_processed = results.get('sentiment_processed', 0)
-                categories_processed = results.get('categories_processed', 0)
-                priorities_processed = results.get('priorities_processed', 0)
-                action_plans = results.get('action_plans_generated', 0)
-                processing_time = results.get('processing_time_seconds', 0)
-                
-                success_message = (
-                    f"✅ Analysis complete!\n\n"
-                    f"📊 *Analysis Results:*\n"
-                    f"• Reviews processed: {reviews_processed}\n"
-                    f"• Sentiment analyzed: {sentiment_processed}\n"
-                    f"• Categories assigned: {categories_processed}\n"
-                    f"• Priorities assigned: {priorities_processed}\n"
-                    f"• Action plans generated: {action_plans}\n"
-                    f"• Processing time: {processing_time} seconds\n\n"
-                    f"Use /report for a summary or /export to download reviews as CSV."
-                )
-                
-                await analysis_message.edit_text(success_message, parse_mode='Markdown')
+            # A progress edit goes out in the background while the new reviews
+            # are counted in the report rollups; the warning is the final word
+            if api_key_configured:
+                await status.set(status_text)
             else:
-                # Format error message
-                error = results.get('error', 'Unknown error')
-                await analysis_message.edit_text(f"❌ Error during analysis: {error}")
+                await status.finish(status_text)
+            await run_db(refresh_daily_metrics)
+            clear_report_cache()
+            
+            if not api_key_configured:
+                return
+            
+            await run_analysis(status, config)
+        elif await run_db(get_pending_backfill) is not None and config.get('OPENAI_API_KEY'):
+            # A Batch API backfill from an earlier /process is ingested even
+            # when there are no new reviews
+            await status.set("⏳ Checking the batch analysis job...")
+            await run_analysis(status, config)
         else:
-            await processing_message.edit_text("ℹ️ No new reviews found for the specified time period.")
+            await status.finish("ℹ️ No new reviews found for the specified time period.")
     
     except Exception as e:
         logger.error(f"Error in process command: {e}")
-        await processing_message.edit_text(f"❌ Error fetching or processing reviews: {str(e)}")
\ No newline at end of file
+        await status.finish(f"❌ Error fetching or processing reviews: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""
+Database connection shared by the Telegram bot command handlers
+"""
+import asyncio
+import logging
+import queue
+import sqlite3
+import threading
+
+from database.sqlite_db import get_connection
+
+logger = logging.getLogger(__name__)
+
+# One connection for the whole bot, opened at startup (or on first use) so
+# the file is opened once and SQLite's page cache stays warm between commands
+_conn = None
+
+# Serializes use of the shared connection by the worker threads
+_lock = threading.Lock()
+
+# Prepared statements kept by the shared connection. The handlers' SQL is
+# module-level constants, so with room for all of them every statement is
+# parsed and planned once for the life of the bot
+CACHED_STATEMENTS = 256
+
+# Extra read-only connections for long reads such as /export. In WAL mode
+# readers do not block each other or the writer, so these run next to
+# commands on the shared connection instead of queueing behind its lock
+READ_CONNECTIONS = 2
+_readers = queue.SimpleQueue()
+_reader_slots = threading.BoundedSemaphore(READ_CONNECTIONS)
+
+def get_conn():
+    """Get the shared database connection, opening it if needed"""
+    global _conn
+    if _conn is None:
+        _conn = get_connection(check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+    return _conn
+
+def close_conn():
+    """Close the shared database connection and the read connections"""
+    global _conn
+    while True:
+        try:
+            _readers.get_nowait().close()
+        except queue.Empty:
+            break
+    with _lock:
+        if _conn is not None:
+            # Refresh the planner statistics that the data added while the
+            # bot ran has made stale, so the report indexes keep being chosen
+            try:
+                _conn.execute('PRAGMA optimize')
+            except sqlite3.Error as e:
+                logger.error(f"Error optimizing database before closing: {e}")
+            _conn.close()
+            _conn = None
+            logger.info("Closed bot database connection")
+
+def _with_connection(func, *args):
+    with _lock:
+        return func(get_conn(), *args)
+
+async def run_db(func, *args):
+    """
+    Run func(conn, *args) on the shared connection in a worker thread, so
+    blocking database work does not stall the event loop
+    """
+    return await asyncio.to_thread(_with_connection, func, *args)
+
+def _open_reader():
+    conn = get_connection(check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+    conn.execute('PRAGMA query_only=ON')
+    return conn
+
+def _with_read_connection(func, *args):
+    with _reader_slots:
+        try:
+            conn = _readers.get_nowait()
+        except queue.Empty:
+            conn = _open_reader()
+        try:
+            return func(conn, *args)
+        finally:
+            _readers.put(conn)
+
+async def run_db_read(func, *args):
+    """
+    Run a read-only func(conn, *args) on one of the read connections in a
+    worker thread, so it neither stalls the event loop nor waits for the
+    shared connection
+    """
+    return await asyncio.to_thread(_with_read_connection, func, *args)
@@ -1,28 +1,46 @@
 """
 Telegram bot setup and command handlers
 """
+import asyncio
 import logging
+import signal
 from telegram import Update
-from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
+from telegram.ext import AIORateLimiter, Application, CommandHandler, ContextTypes, MessageHandler, filters
 from bot.commands import (
     start_command, help_command, report_command, 
     steps_command, process_command, reset_command, export_command,
     handle_reset_confirmation, handle_theme_selection
 )
+from bot.db_pool import get_conn, close_conn
+from utils.config import reload_config
 
 logger = logging.getLogger(__name__)
 
+# Outgoing Telegram requests per second across all chats, under the 30/s
+# flood limit, and how often a request is retried after a RetryAfter
+MAX_REQUESTS_PER_SECOND = 28
+MAX_FLOOD_RETRIES = 3
+
 def setup_bot(config):
     """Set up the Telegram bot with all command handlers"""
     # Create the Application
-    app = Application.builder().token(config['TELEGRAM_TOKEN']).build()
+    app = (
+        Application.builder()
+        .token(config['TELEGRAM_TOKEN'])
+        .rate_limiter(AIORateLimiter(overall_max_rate=MAX_REQUESTS_PER_SECOND, max_retries=MAX_FLOOD_RETRIES))
+        .post_init(on_startup)
+        .post_shutdown(close_database)
+        .build()
+    )
     
     # Add command handlers
     app.add_handler(CommandHandler("start", start_command))
     app.add_handler(CommandHandler("help", help_command))
     app.add_handler(CommandHandler("report", report_command))
-    app.add_handler(CommandHandler("steps", steps_command))
-    app.add_handler(CommandHandler("process", process_command))
+    # /steps and /process can wait minutes on scraping and OpenAI; they run
+    # as background tasks so updates from other chats are not held behind them
+    app.add_handler(CommandHandler("steps", steps_command, block=False))
+    app.add_handler(CommandHandler("process", process_command, block=False))
     app.add_handler(CommandHandler("reset", reset_command))
     app.add_handler(CommandHandler("export", export_command))
     
@@ -36,6 +54,20 @@ def setup_bot(config):
     logger.info("Telegram bot setup complete")
     return app
 
+async def on_startup(app: Application):
+    """Open the shared database connection and watch for SIGHUP when the bot starts"""
+    get_conn()
+    
+    # The configuration is cached; SIGHUP re-reads .env without a restart
+    # (the Telegram token is only read at startup). The handler runs on the
+    # event loop rather than interrupting whatever the main thread is doing
+    if hasattr(signal, 'SIGHUP'):
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_config)
+
+async def close_database(app: Application):
+    """Close the shared database connection when the bot stops"""
+    close_conn()
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle all text messages based on conversation state."""
     # Check what the user is currently doing
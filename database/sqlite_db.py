@@ -1,19 +1,198 @@
 """
 SQLite database operations for storing and retrieving app review data
 """
+import json
 import sqlite3
 import logging
 import os
+import threading
 
 logger = logging.getLogger(__name__)
 DB_PATH = "app_reviews.db"
 
+# Separator used when aggregating categories with GROUP_CONCAT (ASCII unit separator)
+CATEGORY_SEPARATOR = "\x1f"
+
+# Connection-level settings: with WAL journaling (set once on the database
+# file by setup_database) NORMAL sync avoids an fsync per commit, and a
+# larger in-memory page cache speeds up the repeated joins
+CONNECTION_PRAGMAS = """
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-65536;
+PRAGMA mmap_size=268435456;
+"""
+
+# Seconds a connection waits on a locked database before raising "database
+# is locked" - the sentiment and category writers commit concurrently
+BUSY_TIMEOUT = 30.0
+
+def get_connection(check_same_thread=True, cached_statements=128):
+    """
+    Open a database connection with the performance PRAGMAs applied
+    
+    Args:
+        check_same_thread: Whether only the creating thread may use the connection
+        cached_statements: Number of prepared statements the connection keeps
+            for reuse, keyed by SQL text
+    
+    Returns:
+        SQLite connection
+    """
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=BUSY_TIMEOUT,
+        check_same_thread=check_same_thread,
+        cached_statements=cached_statements
+    )
+    conn.executescript(CONNECTION_PRAGMAS)
+    return conn
+
+# Columns of the review tuples given to save_reviews, in insert order
+REVIEW_COLUMNS = ('review_id', 'app_id', 'username', 'review_text', 'rating', 'timestamp')
+
+# Statement text used by save_reviews. The per-thread connection caches
+# prepared statements by SQL text, so every /process reuses the compiled insert
+INSERT_REVIEW_SQL = '''
+INSERT OR IGNORE INTO reviews (
+    review_id, app_id, username, review_text,
+    rating, timestamp, date_added, processed
+) VALUES (?, ?, ?, ?, ?, ?, datetime('now'), FALSE)
+'''
+
+# Per-thread connections reused by the short helpers below, so each call does
+# not reopen the file and start with a cold page cache
+_thread_connections = threading.local()
+
+def get_thread_connection():
+    """
+    Get this thread's reusable database connection, opening it on first use
+    (or after DB_PATH changed). Callers must not close it, and must commit or
+    roll back before returning
+    
+    Returns:
+        SQLite connection
+    """
+    cached = getattr(_thread_connections, 'conn', None)
+    if cached is None or cached[0] != DB_PATH:
+        cached = (DB_PATH, get_connection())
+        _thread_connections.conn = cached
+    return cached[1]
+
+def refresh_daily_metrics(db_conn, days=8):
+    """
+    Recompute the per-day review counts in metrics_daily for recent days
+    
+    Args:
+        db_conn: Database connection
+        days: Number of past days (plus today) to recompute
+    
+    Returns:
+        Boolean indicating success
+    """
+    try:
+        since = f"-{days} day"
+        cursor = db_conn.cursor()
+        
+        if not db_conn.in_transaction:
+            cursor.execute('BEGIN IMMEDIATE')
+        
+        cursor.execute('''
+        DELETE FROM metrics_daily WHERE day >= date('now', ?)
+        ''', (since,))
+        # CROSS JOIN keeps the recent reviews as the outer loop, so each joined
+        # table is probed through its review_id index instead of scanned
+        cursor.execute('''
+        INSERT INTO metrics_daily (day, kind, bucket, count)
+        WITH recent AS (
+            SELECT review_id, rating, date(date_added) AS day FROM reviews
+            WHERE date_added >= date('now', ?)
+        )
+        SELECT day, 'rating', rating, COUNT(*) FROM recent
+        GROUP BY day, rating
+        UNION ALL
+        SELECT r.day, 'sentiment', s.sentiment, COUNT(*) FROM recent r
+        CROSS JOIN sentiment s ON r.review_id = s.review_id
+        GROUP BY r.day, s.sentiment
+        UNION ALL
+        SELECT r.day, 'priority', p.priority_level, COUNT(*) FROM recent r
+        CROSS JOIN priorities p ON r.review_id = p.review_id
+        GROUP BY r.day, p.priority_level
+        UNION ALL
+        SELECT r.day, 'category', c.category, COUNT(*) FROM recent r
+        CROSS JOIN categories c ON r.review_id = c.review_id
+        GROUP BY r.day, c.category
+        ''', (since,))
+        
+        db_conn.commit()
+        return True
+    except sqlite3.Error as e:
+        logger.error(f"Error refreshing daily metrics: {e}")
+        db_conn.rollback()
+        return False
+
+def analyze_database(db_conn):
+    """
+    Refresh the planner statistics in sqlite_stat1 after a bulk load, so the
+    report and action plan queries keep choosing the date and review_id indexes
+    
+    Args:
+        db_conn: Database connection
+    
+    Returns:
+        Boolean indicating success
+    """
+    try:
+        # Sample at most about 1000 rows per index so this stays quick on a
+        # large database
+        db_conn.execute('PRAGMA analysis_limit=1000')
+        db_conn.execute('ANALYZE')
+        db_conn.commit()
+        return True
+    except sqlite3.Error as e:
+        logger.error(f"Error analyzing database: {e}")
+        return False
+
+def bulk_insert(db_conn, table, columns, rows):
+    """
+    Insert a large number of rows through an unindexed staging table
+    
+    Rows are staged in a TEMP table (kept in memory by temp_store=MEMORY) and
+    copied with one INSERT ... SELECT ordered by the first column, so the
+    target table's indexes are updated in a single sorted pass rather than
+    once per row. The caller commits.
+    
+    Args:
+        db_conn: Database connection
+        table: Target table name
+        columns: Column names, in the order of the row tuples
+        rows: Iterable of row tuples
+    """
+    column_list = ", ".join(columns)
+    placeholders = ", ".join("?" * len(columns))
+    staging_table = f"bulk_{table}"
+    
+    cursor = db_conn.cursor()
+    cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS {staging_table} AS SELECT {column_list} FROM {table} WHERE 0")
+    cursor.execute(f"DELETE FROM {staging_table}")
+    cursor.executemany(f"INSERT INTO {staging_table} ({column_list}) VALUES ({placeholders})", rows)
+    cursor.execute(f"""
+    INSERT INTO {table} ({column_list})
+    SELECT {column_list} FROM {staging_table} ORDER BY {columns[0]}
+    """)
+    cursor.execute(f"DELETE FROM {staging_table}")
+
 def setup_database():
     """Initialize the SQLite database with necessary tables"""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_connection()
         cursor = conn.cursor()
         
+        # WAL mode is stored in the database file, so it is switched on here
+        # once rather than by every connection; readers such as /export then
+        # no longer block on the scraper's writes
+        cursor.execute('PRAGMA journal_mode=WAL')
+        
         # Create reviews table
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS reviews (
@@ -69,10 +248,114 @@ def setup_database():
             action_steps TEXT,  -- JSON array of steps
             user_response TEXT,
             review_count INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (title)
+        )
+        ''')
+        
+        # Older databases were created without UNIQUE (title): drop duplicate
+        # titles (keeping the newest) and enforce uniqueness with an index
+        cursor.execute('''
+        DELETE FROM action_plans
+        WHERE id NOT IN (SELECT MAX(id) FROM action_plans GROUP BY title)
+        ''')
+        cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_action_plans_title ON action_plans (title)
+        ''')
+        
+        # Sample reviews shown with a plan (JSON array of review texts), kept
+        # with it so a selected theme can be read back from the database, and
+        # the plan's index in the last saved list, which sets the display
+        # order; older databases lack the columns
+        cursor.execute("PRAGMA table_info(action_plans)")
+        action_plan_columns = {column[1] for column in cursor.fetchall()}
+        if 'review_samples' not in action_plan_columns:
+            cursor.execute('ALTER TABLE action_plans ADD COLUMN review_samples TEXT')
+        if 'position' not in action_plan_columns:
+            cursor.execute('ALTER TABLE action_plans ADD COLUMN position INTEGER')
+        
+        # Prompt responses are only cached by exact prompt; drop the
+        # embedding-keyed table older databases still have
+        cursor.execute('DROP TABLE IF EXISTS response_cache')
+        
+        # Create prompt_cache table - OpenAI responses keyed by exact prompt hash
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS prompt_cache (
+            hash BLOB PRIMARY KEY,
+            response TEXT,
             created_at TEXT DEFAULT CURRENT_TIMESTAMP
         )
         ''')
         
+        # Create review_cache table - analysis results keyed by review text embedding
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS review_cache (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT,
+            text_hash BLOB,
+            review_text TEXT,
+            embedding BLOB,  -- float16 unit vector
+            result TEXT,  -- JSON encoded sentiment or category list
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (kind, text_hash)
+        )
+        ''')
+        
+        # Create metrics_daily table - per-day review counts for the weekly report
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS metrics_daily (
+            day TEXT,
+            kind TEXT,  -- rating, sentiment, priority, or category
+            bucket TEXT,
+            count INTEGER,
+            PRIMARY KEY (day, kind, bucket)
+        )
+        ''')
+        
+        # Create meta table - small key/value state, e.g. the review state the
+        # stored action plans were generated from
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+        ''')
+        
+        # Indexes supporting the high-priority review query (priority + sentiment + date)
+        cursor.executescript('''
+        CREATE INDEX IF NOT EXISTS idx_priorities_level_review ON priorities (priority_level, review_id);
+        CREATE INDEX IF NOT EXISTS idx_sentiment_review_sentiment ON sentiment (review_id, sentiment);
+        CREATE INDEX IF NOT EXISTS idx_reviews_review_id_date ON reviews (review_id, date_added DESC);
+        CREATE INDEX IF NOT EXISTS idx_categories_review ON categories (review_id, category);
+        ''')
+        
+        # Covering indexes for the weekly report: a range scan on date_added
+        # yields rating and review_id without reading the reviews table, and
+        # each joined breakdown is answered from its review_id index.
+        # idx_reviews_date also serves ORDER BY date_added DESC LIMIT ? by
+        # scanning backwards, so no separate descending index is needed
+        cursor.executescript('''
+        CREATE INDEX IF NOT EXISTS idx_reviews_date ON reviews (date_added, rating, review_id);
+        CREATE INDEX IF NOT EXISTS idx_priorities_review_level ON priorities (review_id, priority_level);
+        ''')
+        
+        # Partial index holding only the unprocessed reviews, so finding them
+        # does not scan every review ever stored
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_reviews_unprocessed ON reviews (review_id) WHERE processed = FALSE
+        ''')
+        
+        # Index on review text for reusing the sentiment and categories of
+        # reviews with identical text (get_known_sentiments and
+        # get_known_categories look texts up with IN (...)), which otherwise
+        # scans every stored review on each /process
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_reviews_text ON reviews (review_text)
+        ''')
+        
+        # Refresh planner statistics so the new indexes are used
+        cursor.execute('ANALYZE')
+        
         conn.commit()
         logger.info("Database tables created successfully")
         conn.close()
@@ -82,78 +365,143 @@ def setup_database():
         return False
 
 def save_review(review_data):
-    """Save a new review to the database"""
+    """
+    Save a new review to the database. Callers with more than one review
+    should pass them all to save_reviews, which commits once for the batch
+    
+    Returns:
+        True if the review was not stored yet and has been saved
+    """
+    return bool(save_reviews([tuple(review_data[column] for column in REVIEW_COLUMNS)]))
+
+def save_reviews(review_rows):
+    """
+    Save a batch of reviews in a single transaction, skipping reviews that
+    are already stored
+    
+    Args:
+        review_rows: Review tuples in REVIEW_COLUMNS order, passed to the
+            insert as they are
+    
+    Returns:
+        List of the review IDs that were inserted
+    """
+    if not review_rows:
+        return []
+    
+    conn = get_thread_connection()
     try:
-        conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
         
+        # Hold the write lock from the existence check to the insert
+        cursor.execute('BEGIN IMMEDIATE')
+        
+        # The batch's IDs go in as one JSON array, so a single statement with
+        # fixed text (cached like the insert) finds the stored ones however
+        # large the batch is
+        review_ids = list(dict.fromkeys(row[0] for row in review_rows))
         cursor.execute('''
-        INSERT OR IGNORE INTO reviews (
-            review_id, app_id, username, review_text, 
-            rating, timestamp, date_added, processed
-        ) VALUES (?, ?, ?, ?, ?, ?, datetime('now'), FALSE)
-        ''', (
-            review_data['review_id'],
-            review_data['app_id'],
-            review_data['username'],
-            review_data['review_text'],
-            review_data['rating'],
-            review_data['timestamp']
-        ))
+        SELECT review_id FROM reviews WHERE review_id IN (SELECT value FROM json_each(?))
+        ''', (json.dumps(review_ids),))
+        existing_ids = {row[0] for row in cursor.fetchall()}
+        
+        # New rows are handed to executemany as they are found, recording
+        # their IDs on the way; the stored set also drops repeats in the batch
+        inserted_ids = []
+        
+        def new_rows():
+            for row in review_rows:
+                if row[0] not in existing_ids:
+                    existing_ids.add(row[0])
+                    inserted_ids.append(row[0])
+                    yield row
+        
+        cursor.executemany(INSERT_REVIEW_SQL, new_rows())
         
         conn.commit()
-        conn.close()
-        return True
+        return inserted_ids
     except sqlite3.Error as e:
-        logger.error(f"Error saving review: {e}")
-        return False
+        logger.error(f"Error saving reviews: {e}")
+        conn.rollback()
+        return []
 
 def get_unprocessed_reviews():
-    """Get all unprocessed reviews from the database"""
+    """
+    Get all unprocessed reviews from the database, with only the columns the
+    analysis pipeline reads (review_id, review_text and rating)
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_thread_connection()
         cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
         
         cursor.execute('''
-        SELECT * FROM reviews WHERE processed = FALSE
+        SELECT review_id, review_text, rating FROM reviews WHERE processed = FALSE
         ''')
         
         reviews = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         return reviews
     except sqlite3.Error as e:
         logger.error(f"Error retrieving unprocessed reviews: {e}")
         return []
-        
-def mark_review_as_processed(review_id):
-    """Mark a review as processed in the database"""
+
+def get_reviews_by_ids(review_ids):
+    """
+    Get reviews by ID, with the same columns as get_unprocessed_reviews
+    """
+    if not review_ids:
+        return []
+    
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_thread_connection()
         cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
         
         cursor.execute('''
-        UPDATE reviews SET processed = TRUE WHERE review_id = ?
-        ''', (review_id,))
+        SELECT review_id, review_text, rating FROM reviews
+        WHERE review_id IN (SELECT value FROM json_each(?))
+        ''', (json.dumps(list(review_ids)),))
         
-        conn.commit()
-        conn.close()
-        return True
+        return [dict(row) for row in cursor.fetchall()]
     except sqlite3.Error as e:
-        logger.error(f"Error marking review as processed: {e}")
-        return False
-        
+        logger.error(f"Error retrieving reviews by ID: {e}")
+        return []
+
+def review_dicts(cursor):
+    """
+    Build review dictionaries from an executed query that has a
+    CATEGORY_SEPARATOR-joined categories column
+    """
+    # Column names are read once per query rather than per row, and rows are
+    # turned into dictionaries as they are read from the cursor instead of
+    # being collected into a list of tuples first
+    columns = [column[0] for column in cursor.description]
+    categories_index = columns.index('categories')
+    
+    reviews = []
+    for row in cursor:
+        review = dict(zip(columns, row))
+        category_list = row[categories_index]
+        review['categories'] = category_list.split(CATEGORY_SEPARATOR) if category_list else []
+        reviews.append(review)
+    return reviews
+
 def get_recent_reviews(limit=10):
     """Get the most recent reviews from the database"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_thread_connection()
         cursor = conn.cursor()
         
+        # Categories are aggregated in the same query (joined per page of
+        # reviews, after the LIMIT) instead of one query per review. The
+        # ORDER BY ... LIMIT walks idx_reviews_date backwards and stops after
+        # `limit` rows, so the joins only run for the returned reviews
         cursor.execute('''
         SELECT r.*, 
                s.sentiment,
-               p.priority_level
+               p.priority_level,
+               (SELECT GROUP_CONCAT(c.category, CHAR(31)) FROM categories c
+                WHERE c.review_id = r.review_id) AS categories
         FROM reviews r
         LEFT JOIN sentiment s ON r.review_id = s.review_id
         LEFT JOIN priorities p ON r.review_id = p.review_id
@@ -161,56 +509,44 @@ def get_recent_reviews(limit=10):
         LIMIT ?
         ''', (limit,))
         
-        reviews = [dict(row) for row in cursor.fetchall()]
-        
-        # Get categories for each review
-        for review in reviews:
-            cursor.execute('''
-            SELECT category FROM categories
-            WHERE review_id = ?
-            ''', (review['review_id'],))
-            
-            categories = [row[0] for row in cursor.fetchall()]
-            review['categories'] = categories
-            
-        conn.close()
+        reviews = review_dicts(cursor)
         return reviews
     except sqlite3.Error as e:
         logger.error(f"Error retrieving recent reviews: {e}")
         return []
-        
+
 def get_reviews_by_priority(priority_level, limit=10):
     """Get reviews with a specific priority level"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_thread_connection()
         cursor = conn.cursor()
         
+        # The page of reviews is picked first: sorting the level's reviews by
+        # date needs a temporary b-tree, and columns computed before that
+        # sort would aggregate categories for every review of the level.
+        # The outer query joins and aggregates only the `limit` picked ones
         cursor.execute('''
+        WITH page AS (
+            SELECT r.id
+            FROM priorities p
+            JOIN reviews r ON r.review_id = p.review_id
+            WHERE p.priority_level = ?
+            ORDER BY r.date_added DESC
+            LIMIT ?
+        )
         SELECT r.*, 
                s.sentiment,
-               p.priority_level
-        FROM reviews r
+               p.priority_level,
+               (SELECT GROUP_CONCAT(c.category, CHAR(31)) FROM categories c
+                WHERE c.review_id = r.review_id) AS categories
+        FROM page
+        JOIN reviews r ON r.id = page.id
         JOIN priorities p ON r.review_id = p.review_id
         LEFT JOIN sentiment s ON r.review_id = s.review_id
-        WHERE p.priority_level = ?
         ORDER BY r.date_added DESC
-        LIMIT ?
         ''', (priority_level, limit))
         
-        reviews = [dict(row) for row in cursor.fetchall()]
-        
-        # Get categories for each review
-        for review in reviews:
-            cursor.execute('''
-            SELECT category FROM categories
-            WHERE review_id = ?
-            ''', (review['review_id'],))
-            
-            categories = [row[0] for row in cursor.fetchall()]
-            review['categories'] = categories
-            
-        conn.close()
+        reviews = review_dicts(cursor)
         return reviews
     except sqlite3.Error as e:
         logger.error(f"Error retrieving reviews by priority: {e}")
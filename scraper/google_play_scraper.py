@@ -3,12 +3,48 @@ Google Play Store review scraper functionality
 """
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from google_play_scraper import Sort, reviews
-from database.sqlite_db import save_review
+from database.sqlite_db import save_reviews
 
 logger = logging.getLogger(__name__)
 
+# Reviews requested per call. Pages can only be requested one after another
+# (each needs the previous page's continuation token), so the scrape is
+# bound by round trips; Google Play serves up to 4500 reviews per request.
+# The next page is downloaded while the current one is processed
+REVIEWS_PER_REQUEST = 1000
+
+def fetch_page(app_id, page_size, continuation_token=None):
+    """
+    Fetch one page of the newest reviews
+    
+    Args:
+        app_id (str): The Google Play app ID
+        page_size (int): Reviews per page, used for the first page
+        continuation_token: Token returned with the previous page, or None
+            for the first page
+    
+    Returns:
+        tuple: (list of review dictionaries, continuation token)
+    """
+    if continuation_token is None:
+        return reviews(
+            app_id,
+            lang='en', 
+            country='us',
+            sort=Sort.NEWEST,
+            count=page_size
+        )
+    return reviews(app_id, continuation_token=continuation_token)
+
+def review_datetime(review_at):
+    """Get a review's 'at' field, normally a datetime and rarely a timestamp, as a datetime"""
+    if isinstance(review_at, datetime):
+        return review_at
+    return datetime.fromtimestamp(review_at)
+
 def fetch_reviews(app_id, days=7, max_reviews=100):
     """
     Fetch recent reviews from Google Play for the specified app
@@ -19,7 +55,7 @@ def fetch_reviews(app_id, days=7, max_reviews=100):
         max_reviews (int): Maximum number of reviews to fetch
         
     Returns:
-        int: Number of new reviews fetched and saved
+        list: IDs of the new reviews that were saved
     """
     logger.info(f"Fetching reviews for app {app_id} from the last {days} days (max: {max_reviews})")
     
@@ -29,32 +65,23 @@ def fetch_reviews(app_id, days=7, max_reviews=100):
     
     logger.info(f"Using cutoff date: {cutoff_date.isoformat()}")
     
-    new_reviews_count = 0
+    new_reviews = []
     total_fetched = 0
-    continuation_token = None
+    page_size = min(REVIEWS_PER_REQUEST, max_reviews)
+    
+    # One worker downloads the next page while this thread processes the
+    # current one
+    page_fetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="review-page")
     
     try:
+        next_page = page_fetcher.submit(fetch_page, app_id, page_size)
+        
         # Keep fetching reviews in batches until we have enough or run out
-        while total_fetched < max_reviews:
-            # Fetch a batch of reviews
+        while next_page is not None:
             try:
-                if continuation_token is None:
-                    # Initial fetch
-                    result, continuation_token = reviews(
-                        app_id,
-                        lang='en', 
-                        country='us',
-                        sort=Sort.NEWEST,
-                        count=min(100, max_reviews - total_fetched)
-                    )
-                    logger.info(f"Initial fetch: {len(result)} reviews retrieved")
-                else:
-                    # Subsequent fetch using continuation token
-                    result, continuation_token = reviews(
-                        app_id,
-                        continuation_token=continuation_token
-                    )
-                    logger.info(f"Additional fetch: {len(result)} reviews retrieved")
+                result, continuation_token = next_page.result()
+                next_page = None
+                logger.info(f"Fetched {len(result)} reviews")
                 
                 if not result:
                     logger.info("No reviews returned from fetch")
@@ -62,29 +89,45 @@ def fetch_reviews(app_id, days=7, max_reviews=100):
                     
                 total_fetched += len(result)
                 
-                # Process reviews in this batch
-                batch_count = process_reviews(result, app_id, cutoff_timestamp)
-                new_reviews_count += batch_count
+                # Request the next page before processing this one, unless this
+                # page already ends the scrape: enough reviews, a short last
+                # page, or its oldest review is past the cutoff (reviews are
+                # newest first)
+                oldest = result[-1].get('at')
+                if (total_fetched < max_reviews and len(result) == page_size
+                        and (oldest is None or review_datetime(oldest) >= cutoff_date)):
+                    next_page = page_fetcher.submit(fetch_page, app_id, page_size, continuation_token)
+                
+                # Collect the reviews in this batch that are within the date range
+                batch_reviews, reached_cutoff = process_reviews(result, app_id, cutoff_timestamp)
+                new_reviews.extend(batch_reviews)
                 
-                # If we've reached our limit or found older reviews, stop
-                if batch_count == 0 or continuation_token is None:
+                # Stop at the first review older than the cutoff
+                if reached_cutoff:
                     break
                 
             except Exception as e:
                 logger.error(f"Error during review fetch: {e}")
                 break
         
-        logger.info(f"Review fetch complete. Total new reviews saved: {new_reviews_count}")
-        return new_reviews_count
+        # Save everything in one transaction
+        new_review_ids = save_reviews(new_reviews)
+        
+        logger.info(f"Review fetch complete. Total new reviews saved: {len(new_review_ids)}")
+        return new_review_ids
         
     except Exception as e:
         logger.error(f"Failed to fetch reviews: {e}")
-        return 0
+        return []
+    
+    finally:
+        # A page still downloading after an error is not waited for
+        page_fetcher.shutdown(wait=False, cancel_futures=True)
 
 
 def process_reviews(reviews_batch, app_id, cutoff_timestamp):
     """
-    Process a batch of reviews, saving those that meet the date criteria
+    Process a batch of reviews, keeping those that meet the date criteria
     
     Args:
         reviews_batch (list): List of review dictionaries from Google Play
@@ -92,9 +135,14 @@ def process_reviews(reviews_batch, app_id, cutoff_timestamp):
         cutoff_timestamp (float): Timestamp for filtering older reviews
         
     Returns:
-        int: Number of reviews processed and saved from this batch
+        tuple: (list of review tuples, in database.sqlite_db.REVIEW_COLUMNS
+            order, for the reviews within the date range; whether a review
+            older than the cutoff was reached)
     """
-    processed_count = 0
+    batch_reviews = []
+    
+    # Reviews are compared as datetimes, so only the cutoff is converted
+    cutoff_date = datetime.fromtimestamp(cutoff_timestamp)
     
     for review in reviews_batch:
         try:
@@ -103,42 +151,26 @@ def process_reviews(reviews_batch, app_id, cutoff_timestamp):
                 continue
             
             # Handle the 'at' field which could be either a timestamp or datetime
-            review_at = review['at']
-            
-            # Convert to timestamp if it's a datetime object
-            if isinstance(review_at, datetime):
-                review_timestamp = time.mktime(review_at.timetuple())
-            else:
-                review_timestamp = review_at
+            review_date = review_datetime(review['at'])
             
             # Check if review is within our date range
-            if review_timestamp >= cutoff_timestamp:
-                # Get the proper datetime for storage
-                if isinstance(review_at, datetime):
-                    review_date = review_at
-                else:
-                    review_date = datetime.fromtimestamp(review_timestamp)
-                
-                # Prepare review data
-                review_data = {
-                    'review_id': str(review['reviewId']),
-                    'app_id': app_id,
-                    'username': review['userName'],
-                    'review_text': review['content'],
-                    'rating': review['score'],
-                    'timestamp': review_date.isoformat()
-                }
-                
-                # Save to database
-                if save_review(review_data):
-                    processed_count += 1
+            if review_date >= cutoff_date:
+                # Prepare the review row, in the order save_reviews inserts it
+                batch_reviews.append((
+                    str(review['reviewId']),
+                    app_id,
+                    review['userName'],
+                    review['content'],
+                    review['score'],
+                    review_date.isoformat()
+                ))
             else:
                 # Found a review older than our cutoff
-                logger.info(f"Found review older than cutoff date")
-                return processed_count
+                logger.info("Found review older than cutoff date")
+                return batch_reviews, True
                 
         except Exception as e:
             logger.error(f"Error processing review: {e}")
             continue
             
-    return processed_count
\ No newline at end of file
+    return batch_reviews, False
\ No newline at end of file
@@ -0,0 +1,37 @@
+"""
+Helpers for running asyncio code from the synchronous parts of the App Review Bot
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.openai_client import close_async_clients
+
+async def _run_and_close_clients(coro):
+    try:
+        return await coro
+    finally:
+        await close_async_clients()
+
+def run_coroutine(coro):
+    """
+    Run a coroutine to completion from synchronous code
+    
+    Uses asyncio.run when no event loop is running in this thread, otherwise
+    runs it on a fresh loop in a worker thread so callers inside the bot's
+    event loop are not rejected. The async OpenAI clients opened on that
+    loop are closed before it ends.
+    
+    Args:
+        coro: Coroutine to run
+        
+    Returns:
+        The coroutine's result
+    """
+    coro = _run_and_close_clients(coro)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
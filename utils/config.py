@@ -4,6 +4,7 @@ Configuration handling for the App Review Bot
 import os
 import json
 import logging
+from functools import lru_cache
 from dotenv import load_dotenv
 
 logger = logging.getLogger(__name__)
@@ -14,10 +15,18 @@ DEFAULT_CONFIG = {
     'DAYS_TO_SCRAPE': 7,       # Number of days in the past to scrape reviews
     'MAX_REVIEWS': 50,        # Maximum number of reviews to scrape
     'OPENAI_MODEL': 'gpt-3.5-turbo',  # OpenAI model to use for analysis
+    'BATCH_THRESHOLD': 1000,  # Unprocessed reviews sent to the Batch API at or above this count (0 disables)
 }
 
+@lru_cache(maxsize=1)
 def load_config():
-    """Load configuration from .env file and create config if it doesn't exist"""
+    """
+    Load configuration from .env file and create config if it doesn't exist
+    
+    The configuration is read once per process and the same dictionary is
+    returned afterwards, so callers must not modify it. Call
+    load_config.cache_clear() to read it again.
+    """
     # Load environment variables from .env file
     load_dotenv()
     
@@ -34,6 +43,8 @@ def load_config():
             config['DAYS_TO_SCRAPE'] = int(os.getenv('DAYS_TO_SCRAPE'))
         if os.getenv('MAX_REVIEWS'):
             config['MAX_REVIEWS'] = int(os.getenv('MAX_REVIEWS'))
+        if os.getenv('BATCH_THRESHOLD'):
+            config['BATCH_THRESHOLD'] = int(os.getenv('BATCH_THRESHOLD'))
     except ValueError as e:
         logger.warning(f"Error parsing numeric config values: {e}")
     
@@ -48,4 +59,12 @@ def load_config():
             json.dump(config, f, indent=4)
         logger.info("Created default config.json file")
     
-    return config
\ No newline at end of file
+    return config
+
+def reload_config():
+    """Make the next load_config call read the edited .env file again"""
+    # Values from the first load are already in the environment, and
+    # load_dotenv does not replace them unless told to
+    load_dotenv(override=True)
+    load_config.cache_clear()
+    logger.info("Configuration will be reloaded from .env")
@@ -2,39 +2,71 @@
 Export functionality for the App Review Bot
 """
 import csv
+import io
 import os
 import sqlite3
 import logging
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+
+from database.sqlite_db import CATEGORY_SEPARATOR
 
 logger = logging.getLogger(__name__)
 
-def generate_reviews_csv(db_path: str, days: int = 7) -> Optional[str]:
+@lru_cache(maxsize=8)
+def export_cutoff(today: date, days: int) -> str:
     """
-    Generate a CSV file with the latest analyzed reviews
+    Start of the export window: the whole day `days` days before `today`, as
+    an ISO date. date_added values on that day ("YYYY-MM-DD HH:MM:SS") sort
+    after it, so the day is included; the window moves once a day, so the
+    value is computed once per day
     
     Args:
-        db_path: Path to the SQLite database
+        today: Current date
+        days: Number of days to include in the export
+    
+    Returns:
+        ISO date string
+    """
+    return (today - timedelta(days=days)).isoformat()
+
+def generate_reviews_csv(db_conn: sqlite3.Connection, days: int = 7) -> Optional[Tuple[str, io.BytesIO]]:
+    """
+    Generate a CSV export of the latest analyzed reviews in memory
+    
+    Args:
+        db_conn: Database connection
         days: Number of days to include in the export (default: 7)
-        
+    
     Returns:
-        Path to the generated CSV file, or None if an error occurred
+        Tuple of (file name, UTF-8 CSV contents positioned at the start),
+        or None if there are no reviews or an error occurred
     """
     try:
         # Calculate the date cutoff
-        cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
+        cutoff_date = export_cutoff(date.today(), days)
         
-        # Connect to the database
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        cursor = db_conn.cursor()
         
-        # Fetch the reviews with all related data
+        # Get themes from action_plans
+        cursor.execute('''
+        SELECT title FROM action_plans
+        ORDER BY created_at DESC
+        LIMIT 10
+        ''')
+        themes = [(row[0], row[0].lower()) for row in cursor.fetchall()]
+        
+        # Fetch the reviews with all related data, in CSV column order (the
+        # categories yield both the Categories and Themes columns); each
+        # review's categories are aggregated in the same query rather than
+        # queried per review
         cursor.execute('''
         SELECT 
-            r.review_id, r.username, r.review_text, r.rating, r.timestamp,
-            s.sentiment, p.priority_level
+            r.username, r.rating, s.sentiment, p.priority_level,
+            (SELECT GROUP_CONCAT(c.category, CHAR(31)) FROM categories c
+             WHERE c.review_id = r.review_id) AS categories,
+            r.review_text, r.timestamp
         FROM reviews r
         LEFT JOIN sentiment s ON r.review_id = s.review_id
         LEFT JOIN priorities p ON r.review_id = p.review_id
@@ -42,74 +74,59 @@ def generate_reviews_csv(db_path: str, days: int = 7) -> Optional[str]:
         ORDER BY r.date_added DESC
         ''', (cutoff_date,))
         
-        reviews = [dict(row) for row in cursor.fetchall()]
-        
-        # If no reviews found, return None
-        if not reviews:
-            logger.info("No reviews found for export")
-            return None
-        
-        # Get categories for each review
-        for review in reviews:
-            cursor.execute('''
-            SELECT category FROM categories
-            WHERE review_id = ?
-            ''', (review['review_id'],))
-            
-            categories = [row[0] for row in cursor.fetchall()]
-            review['categories'] = ", ".join(categories) if categories else ""
-            
-        # Get themes from action_plans
-        cursor.execute('''
-        SELECT title FROM action_plans
-        ORDER BY created_at DESC
-        LIMIT 10
-        ''')
-        themes = [row[0] for row in cursor.fetchall()]
-        
-        # Try to match reviews to themes (simplified approach)
-        # In a more complex implementation, we would have a direct mapping
-        for review in reviews:
-            review['themes'] = ""  # Default to empty
-            
-            # Simple heuristic: if categories match words in theme titles, associate them
-            if review['categories']:
-                for theme in themes:
-                    for category in review['categories'].split(", "):
-                        if category.lower() in theme.lower():
-                            review['themes'] = theme
-                            break
-                    if review['themes']:
-                        break
-        
         # Create a timestamped filename
         timestamp = datetime.now().strftime('%Y-%m-%d')
         filename = f"reviews_export_{timestamp}.csv"
         
-        # Write the CSV file
-        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = [
-                'Reviewer Name', 'Star Rating', 'Sentiment', 'Priority',
-                'Categories', 'Themes', 'Review Text', 'Date'
-            ]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        # Write the CSV into a buffer that can be sent as is, rather than to
+        # a file on disk that has to be read back and deleted
+        csv_buffer = io.BytesIO()
+        csvfile = io.TextIOWrapper(csv_buffer, encoding='utf-8', newline='')
+        writer = csv.writer(csvfile)
+        
+        writer.writerow([
+            'Reviewer Name', 'Star Rating', 'Sentiment', 'Priority',
+            'Categories', 'Themes', 'Review Text', 'Date'
+        ])
+        
+        # Rows are written as they are read from the cursor, without first
+        # collecting the reviews into a list
+        review_count = 0
+        
+        # Reviews draw from a small set of categories, so the formatted
+        # categories and matched theme are worked out once per distinct
+        # combination: {aggregated categories: (categories text, theme)}
+        category_columns = {}
+        for username, rating, sentiment, priority_level, category_list, review_text, review_timestamp in cursor:
+            columns = category_columns.get(category_list)
+            if columns is None:
+                categories = category_list.split(CATEGORY_SEPARATOR) if category_list else []
+                
+                # Match the review to a theme (simplified approach: the first
+                # theme whose title contains one of the review's categories)
+                # In a more complex implementation, we would have a direct mapping
+                lowered_categories = [category.lower() for category in categories]
+                theme = next(
+                    (theme for theme, lowered_theme in themes
+                     if any(category in lowered_theme for category in lowered_categories)),
+                    ""
+                )
+                columns = category_columns[category_list] = (", ".join(categories), theme)
             
-            writer.writeheader()
-            for review in reviews:
-                writer.writerow({
-                    'Reviewer Name': review['username'],
-                    'Star Rating': review['rating'],
-                    'Sentiment': review.get('sentiment', 'Not analyzed'),
-                    'Priority': review.get('priority_level', 'Not set'),
-                    'Categories': review['categories'],
-                    'Themes': review['themes'],
-                    'Review Text': review['review_text'],
-                    'Date': review.get('timestamp', 'Unknown')
-                })
+            writer.writerow((username, rating, sentiment, priority_level, *columns, review_text, review_timestamp))
+            review_count += 1
         
-        conn.close()
-        return filename
+        # Flush the text into the buffer and release it from the wrapper
+        csvfile.detach()
         
+        # If no reviews found, return None
+        if not review_count:
+            logger.info("No reviews found for export")
+            return None
+        
+        csv_buffer.seek(0)
+        return filename, csv_buffer
+    
     except Exception as e:
         logger.error(f"Error generating CSV export: {e}")
         return None
\ No newline at end of file
@@ -27,6 +27,8 @@ def setup_logger():
     
     # Set more restrictive log levels for some noisy libraries
     logging.getLogger('httpx').setLevel(logging.WARNING)
+    logging.getLogger('httpcore').setLevel(logging.WARNING)
     logging.getLogger('telegram').setLevel(logging.WARNING)
+    logging.getLogger('google_play_scraper').setLevel(logging.WARNING)
     
     return logging.getLogger(__name__)
\ No newline at end of file
@@ -0,0 +1,188 @@
+"""
+Shared OpenAI clients for the App Review Bot
+"""
+import asyncio
+import atexit
+import logging
+import threading
+import time
+import weakref
+from functools import lru_cache
+import httpx
+import openai
+
+logger = logging.getLogger(__name__)
+
+# Request timeout (seconds) and retry count applied to every client
+OPENAI_TIMEOUT = 30
+OPENAI_MAX_RETRIES = 2
+
+# Connection pool size, large enough for every concurrent request to keep
+# its connection alive between calls
+OPENAI_MAX_CONNECTIONS = 100
+
+# Account rate limits shared by all async chat requests
+OPENAI_RPM_LIMIT = 3500     # Requests per minute
+OPENAI_TPM_LIMIT = 90000    # Tokens per minute
+
+# Retry policy for transient errors (rate limits, timeouts, connection and 5xx errors)
+MAX_ATTEMPTS = 3
+INITIAL_BACKOFF_SECONDS = 1.0
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+# Async clients keep connections tied to the event loop they were first used
+# on, so they are cached per loop: {loop: {api_key: client}}. Every request
+# of one run_coroutine call shares the client; it is closed when that
+# call's loop finishes
+_async_clients = weakref.WeakKeyDictionary()
+
+def http_limits() -> httpx.Limits:
+    """Connection pool limits shared by the sync and async clients"""
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_CONNECTIONS
+    )
+
+@lru_cache(maxsize=4)
+def get_client(api_key: str) -> openai.OpenAI:
+    """
+    Get the synchronous OpenAI client for an API key
+    
+    The client is created once per key so its HTTP connection pool is
+    reused across requests instead of reconnecting for every call.
+    
+    Args:
+        api_key: OpenAI API key
+    
+    Returns:
+        OpenAI client
+    """
+    client = openai.OpenAI(
+        api_key=api_key,
+        timeout=OPENAI_TIMEOUT,
+        max_retries=OPENAI_MAX_RETRIES,
+        http_client=openai.DefaultHttpxClient(limits=http_limits())
+    )
+    atexit.register(client.close)
+    return client
+
+def get_async_client(api_key: str) -> openai.AsyncOpenAI:
+    """
+    Get the asynchronous OpenAI client for an API key on the running event loop
+    
+    Args:
+        api_key: OpenAI API key
+    
+    Returns:
+        AsyncOpenAI client
+    """
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.setdefault(loop, {})
+    
+    if api_key not in clients:
+        clients[api_key] = openai.AsyncOpenAI(
+            api_key=api_key,
+            timeout=OPENAI_TIMEOUT,
+            max_retries=0,  # Retries are handled by create_chat_completion
+            http_client=openai.DefaultAsyncHttpxClient(limits=http_limits())
+        )
+    
+    return clients[api_key]
+
+async def close_async_clients():
+    """
+    Close the async clients created on the running event loop, releasing
+    their connection pools before the loop goes away
+    """
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        try:
+            await client.close()
+        except Exception as e:
+            logger.error(f"Error closing OpenAI client: {e}")
+
+class RateLimiter:
+    """
+    Token bucket refilled continuously up to `capacity` per `period` seconds
+    
+    The bucket state is guarded by a thread lock rather than an asyncio lock
+    so one limiter can be shared by event loops running in different threads.
+    """
+    
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    async def acquire(self, amount: float = 1):
+        """Wait until `amount` tokens are available and take them"""
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            await asyncio.sleep(wait)
+    
+    def adjust(self, amount: float):
+        """Take (or, if negative, return) tokens once the actual cost is known"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+REQUEST_LIMITER = RateLimiter(OPENAI_RPM_LIMIT)
+TOKEN_LIMITER = RateLimiter(OPENAI_TPM_LIMIT)
+
+def estimate_tokens(messages, max_tokens: int = 0) -> int:
+    """Rough token estimate for a chat request (about 4 characters per token)"""
+    return sum(len(message['content']) for message in messages) // 4 + max_tokens
+
+async def create_chat_completion(client: openai.AsyncOpenAI, **kwargs):
+    """
+    Create a chat completion within the shared RPM/TPM limits
+    
+    Rate limit, timeout, connection and server errors are retried with
+    exponential backoff; any other error is raised immediately.
+    
+    Args:
+        client: AsyncOpenAI client
+        **kwargs: Arguments for client.chat.completions.create
+    
+    Returns:
+        The chat completion response
+    """
+    estimated_tokens = estimate_tokens(kwargs['messages'], kwargs.get('max_tokens', 0))
+    delay = INITIAL_BACKOFF_SECONDS
+    
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        await REQUEST_LIMITER.acquire()
+        await TOKEN_LIMITER.acquire(estimated_tokens)
+        
+        try:
+            response = await client.chat.completions.create(**kwargs)
+        except RETRYABLE_ERRORS as e:
+            if attempt == MAX_ATTEMPTS:
+                raise
+            logger.warning(
+                f"OpenAI request failed ({type(e).__name__}), retrying in {delay:.0f}s "
+                f"(attempt {attempt}/{MAX_ATTEMPTS})"
+            )
+            await asyncio.sleep(delay)
+            delay *= 2
+            continue
+        
+        # Correct the token bucket with the actual usage when it is reported
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            TOKEN_LIMITER.adjust(usage.total_tokens - estimated_tokens)
+        
+        return response